@@ -1,101 +1,158 @@
-from flask import Flask, render_template, request, jsonify
-import json
+from flask import Flask, Response, render_template, request, jsonify
 from datetime import datetime
+from functools import wraps
+import gzip
+import hashlib
+from schedule_store import ScheduleStore, copy_stats
+from schedule_queries import ScheduleQueries, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
 
 app = Flask(__name__)
 
+# スケジュールデータの取得元（'db': MySQLから直接検索 / 'json': schedule.jsonを読み込む）
+SCHEDULE_SOURCE = 'db'
+
+# schedule.jsonはプロセス内で1回だけ読み込み、ファイルが更新された場合のみ読み込み直す
+schedule_store = ScheduleStore()
+
+# MySQLの検索結果は短時間キャッシュする
+schedule_queries = ScheduleQueries()
+
+# JSON APIのCache-Control
+# 検索・予定は条件を切り替えるたびにETagで確認させ（変更がなければ304）、一覧・統計は短時間ブラウザにキャッシュさせる
+CACHE_CONTROL_SEARCH = 'no-cache'
+CACHE_CONTROL_EVENTS = 'no-cache'
+CACHE_CONTROL_FACILITIES = 'max-age=300'
+CACHE_CONTROL_DATES = 'max-age=60'
+CACHE_CONTROL_STATS = 'max-age=30'
+
+# この大きさ（バイト）以上のJSONレスポンスをgzipで圧縮する
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+def cacheable_json(cache_control):
+    """JSON APIにETag・Last-Modified・Cache-Controlを付け、変更がなければ304を返すデコレーター
+
+    schedule.jsonの場合はスナップショットの版とURLからETagを作るため、
+    変更がなければ結果を作らずに304を返す。DBの場合はレスポンスの内容からETagを作る。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = None
+            modified_at = None
+            if SCHEDULE_SOURCE == 'json':
+                snapshot = schedule_store.snapshot()
+                etag = hashlib.sha1(f'{snapshot.version}|{request.full_path}'.encode('utf-8')).hexdigest()
+                modified_at = snapshot.modified_at
+                if request.if_none_match.contains_weak(etag):
+                    response = Response(status=304)
+                    response.set_etag(etag, weak=True)
+                    response.last_modified = modified_at
+                    response.headers['Cache-Control'] = cache_control
+                    return response
+
+            response = view(*args, **kwargs)
+            if etag:
+                response.set_etag(etag, weak=True)
+            else:
+                response.add_etag(weak=True)
+            if modified_at:
+                response.last_modified = modified_at
+            response.headers['Cache-Control'] = cache_control
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+@app.after_request
+def compress_response(response):
+    """JSONのレスポンスをgzipで圧縮（Accept-Encodingにgzipがある場合）"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 def load_schedule_data():
-    """schedule.jsonからデータを読み込む"""
-    try:
-        with open('schedule.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-    except json.JSONDecodeError:
-        return {}
-
-def search_schedules(facility=None, date=None, keyword=None, participant=None):
-    """スケジュールを検索する"""
-    data = load_schedule_data()
-    results = []
-    
-    for place_name, dates_dict in data.items():
-        # 施設名でフィルタ
-        if facility and facility != "all" and place_name != facility:
-            continue
-            
-        if not isinstance(dates_dict, dict):
-            continue
-            
-        for date_key, events in dates_dict.items():
-            # 日付でフィルタ
-            if date and date_key != date:
-                continue
-                
-            if not isinstance(events, list):
-                continue
-                
-            for event in events:
-                if not isinstance(event, dict):
-                    continue
-                
-                # キーワード検索（タイトル、バッジ）
-                if keyword:
-                    keyword_lower = keyword.lower()
-                    title = event.get('title', '').lower()
-                    badge = event.get('badge', '').lower()
-                    
-                    if keyword_lower not in title and keyword_lower not in badge:
-                        continue
-                
-                # 参加者検索
-                if participant:
-                    participants = event.get('participants', [])
-                    participant_lower = participant.lower()
-                    
-                    # 参加者リストに含まれているかチェック
-                    if not any(participant_lower in p.lower() for p in participants):
-                        continue
-                
-                # 結果に追加
-                results.append({
-                    'facility': place_name,
-                    'date': date_key,
-                    'title': event.get('title', ''),
-                    'start_time': event.get('start_datetime', ''),
-                    'end_time': event.get('end_datetime', ''),
-                    'badge': event.get('badge', ''),
-                    'participants': event.get('participants', []),
-                    'url': event.get('description_url', ''),
-                    'id': event.get('id', '')
-                })
-    
-    # 日付と開始時刻でソート
-    results.sort(key=lambda x: (x['date'], x['start_time']))
-    
-    return results
+    """schedule.jsonのデータ（変更不可のスナップショット）を取得"""
+    return schedule_store.snapshot().data
+
+def search_schedules(facility=None, date=None, keyword=None, participant=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """スケジュールを検索する
+
+    Returns:
+        tuple: (一致した件数, そのページの予定のリスト)
+    """
+    facility = facility if facility != "all" else None
+    if SCHEDULE_SOURCE == 'db':
+        return schedule_queries.search(facility, date, keyword, participant, page, per_page)
+
+    # スナップショットごとに作成したインデックスで絞り込み
+    results = schedule_store.snapshot().index.search(
+        facility=facility,
+        date=date,
+        keyword=keyword,
+        participant=participant
+    )
+    offset = (page - 1) * per_page
+    return len(results), results[offset:offset + per_page]
 
-def get_facilities():
+def get_facilities(snapshot=None):
     """施設名のリストを取得"""
-    data = load_schedule_data()
-    return sorted(data.keys())
+    if SCHEDULE_SOURCE == 'db':
+        return schedule_queries.facilities()
+    snapshot = snapshot or schedule_store.snapshot()
+    return list(snapshot.facilities)
 
-def get_dates():
+def get_dates(snapshot=None):
     """日付のリストを取得（ソート済み）"""
+    if SCHEDULE_SOURCE == 'db':
+        return schedule_queries.dates()
+    snapshot = snapshot or schedule_store.snapshot()
+    return list(snapshot.dates)
+
+def get_stats():
+    """施設数・日付数・予定数と、施設・日付・バッジ・ユーザーごとの予定数を取得
+
+    DBの場合は同期時に更新される集計テーブル、JSONの場合はスナップショットの読み込み時に集計した結果を返す。
+    どちらもリクエスト間で共有しているため、コピーを返す。
+    """
+    if SCHEDULE_SOURCE == 'db':
+        return copy_stats(schedule_queries.stats())
+    return copy_stats(schedule_store.snapshot().stats)
+
+def get_events(facility, date):
+    """特定の施設・日付の予定のリストを取得"""
+    if SCHEDULE_SOURCE == 'db':
+        return schedule_queries.events(facility, date)
+
     data = load_schedule_data()
-    dates = set()
-    
-    for dates_dict in data.values():
-        if isinstance(dates_dict, dict):
-            dates.update(dates_dict.keys())
     
-    return sorted(dates)
+    events = []
+    for event in data.get(facility, {}).get(date, ()):
+        events.append({
+            'title': event.get('title', ''),
+            'start_time': event.get('start_datetime', ''),
+            'end_time': event.get('end_datetime', ''),
+            'badge': event.get('badge', ''),
+            'participants': list(event['participants'])
+        })
+    return events
 
 @app.route('/')
 def index():
     """メインページ"""
-    facilities = get_facilities()
-    dates = get_dates()
+    snapshot = schedule_store.snapshot() if SCHEDULE_SOURCE == 'json' else None
+    facilities = get_facilities(snapshot)
+    dates = get_dates(snapshot)
     return render_template('index.html', facilities=facilities, dates=dates)
 
 @app.route('/booking')
@@ -105,27 +162,35 @@ def booking():
     return render_template('booking.html', facilities=facilities)
 
 @app.route('/api/search')
+@cacheable_json(CACHE_CONTROL_SEARCH)
 def api_search():
-    """検索API"""
+    """検索API（page・per_pageでページ指定）"""
     facility = request.args.get('facility', 'all')
     date = request.args.get('date', '')
     keyword = request.args.get('keyword', '')
     participant = request.args.get('participant', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
     
-    results = search_schedules(
+    total, results = search_schedules(
         facility=facility if facility != 'all' else None,
         date=date if date else None,
         keyword=keyword if keyword else None,
-        participant=participant if participant else None
+        participant=participant if participant else None,
+        page=page,
+        per_page=per_page
     )
     
     return jsonify({
         'success': True,
-        'count': len(results),
+        'count': total,
+        'page': page,
+        'per_page': per_page,
         'results': results
     })
 
 @app.route('/api/facilities')
+@cacheable_json(CACHE_CONTROL_FACILITIES)
 def api_facilities():
     """施設一覧API"""
     facilities = get_facilities()
@@ -135,6 +200,7 @@ def api_facilities():
     })
 
 @app.route('/api/dates')
+@cacheable_json(CACHE_CONTROL_DATES)
 def api_dates():
     """日付一覧API"""
     dates = get_dates()
@@ -144,53 +210,21 @@ def api_dates():
     })
 
 @app.route('/api/stats')
+@cacheable_json(CACHE_CONTROL_STATS)
 def api_stats():
     """統計情報API"""
-    data = load_schedule_data()
-    
-    total_facilities = len(data)
-    total_events = 0
-    total_dates = set()
-    
-    for dates_dict in data.values():
-        if isinstance(dates_dict, dict):
-            total_dates.update(dates_dict.keys())
-            for events in dates_dict.values():
-                if isinstance(events, list):
-                    total_events += len(events)
-    
     return jsonify({
         'success': True,
-        'stats': {
-            'total_facilities': total_facilities,
-            'total_dates': len(total_dates),
-            'total_events': total_events
-        }
+        'stats': get_stats()
     })
 
 @app.route('/api/events/<facility>/<date>')
+@cacheable_json(CACHE_CONTROL_EVENTS)
 def api_events_by_date(facility, date):
     """特定の施設・日付の予定を取得"""
-    data = load_schedule_data()
-    
-    events = []
-    if facility in data:
-        if isinstance(data[facility], dict) and date in data[facility]:
-            events_list = data[facility][date]
-            if isinstance(events_list, list):
-                for event in events_list:
-                    if isinstance(event, dict):
-                        events.append({
-                            'title': event.get('title', ''),
-                            'start_time': event.get('start_datetime', ''),
-                            'end_time': event.get('end_datetime', ''),
-                            'badge': event.get('badge', ''),
-                            'participants': event.get('participants', [])
-                        })
-    
     return jsonify({
         'success': True,
-        'events': events
+        'events': get_events(facility, date)
     })
 
 @app.route('/api/book', methods=['POST'])
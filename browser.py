@@ -0,0 +1,113 @@
+"""Chromeブラウザの起動設定
+
+同期・登録ジョブ用の本番プロファイル（ヘッドレス、画像・フォント・CSSのブロック、
+ドライバーパスのキャッシュ、ユーザーデータの再利用）と、
+デバッグ用の画面表示プロファイルを設定で切り替えて使う。
+"""
+import os
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+
+# ブラウザのプロファイル設定
+BROWSER_PROFILES = {
+    # 本番用（cronなどで実行する場合）
+    'production': {
+        'headless': True,
+        'block_images': True,
+        'block_fonts': True,
+        'block_css': True,
+        'page_load_strategy': 'eager'   # DOM構築が終わった時点で次の処理へ進む（要素は明示的に待機する）
+    },
+    # デバッグ用（ブラウザの画面を表示して動作を確認する場合）
+    'interactive': {
+        'headless': False,
+        'block_images': False,
+        'block_fonts': False,
+        'block_css': False,
+        'page_load_strategy': 'normal'
+    }
+}
+
+# ブロックするURLパターン（CDPのNetwork.setBlockedURLsで指定）
+BLOCKED_URL_PATTERNS = {
+    'block_images': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico', '*.bmp'],
+    'block_fonts': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'block_css': ['*.css']
+}
+
+# chromedriverのパス（指定した場合はダウンロードの確認を行わない）
+CHROMEDRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH')
+
+# ChromeDriverManagerで取得したドライバーのパスを保存するファイル
+DRIVER_PATH_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chromedriver_path')
+
+# ユーザーデータディレクトリ（ジョブ・セッションごとに再利用する）
+USER_DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chrome_profiles')
+
+
+def get_driver_path():
+    """chromedriverのパスを取得（キャッシュがあればネットワークにアクセスしない）"""
+    if CHROMEDRIVER_PATH:
+        return CHROMEDRIVER_PATH
+
+    try:
+        with open(DRIVER_PATH_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cached_path = f.read().strip()
+        if cached_path and os.path.exists(cached_path):
+            return cached_path
+    except FileNotFoundError:
+        pass
+
+    # キャッシュがない・ドライバーが削除された場合のみダウンロードを確認
+    from webdriver_manager.chrome import ChromeDriverManager
+    driver_path = ChromeDriverManager().install()
+    try:
+        with open(DRIVER_PATH_CACHE_FILE, 'w', encoding='utf-8') as f:
+            f.write(driver_path)
+    except OSError as e:
+        print(f'ドライバーパスの保存エラー: {e}')
+    return driver_path
+
+
+def create_driver(profile_name='production', job='default', instance=0):
+    """プロファイルに従ってChromeを起動
+
+    Args:
+        profile_name: BROWSER_PROFILESのキー
+        job: ジョブ名（ユーザーデータディレクトリの区別に使用）
+        instance: 同じジョブで複数起動する場合の番号
+    """
+    profile = BROWSER_PROFILES[profile_name]
+
+    options = webdriver.ChromeOptions()
+    if profile['headless']:
+        options.add_argument('--headless=new')
+        options.add_argument('--window-size=1280,1024')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--no-first-run')
+    options.add_argument('--no-default-browser-check')
+    options.page_load_strategy = profile['page_load_strategy']
+
+    # ユーザーデータディレクトリを再利用（同時に起動するブラウザごとに分ける）
+    user_data_dir = os.path.join(USER_DATA_ROOT, f'{job}_{instance}')
+    os.makedirs(user_data_dir, exist_ok=True)
+    options.add_argument(f'--user-data-dir={user_data_dir}')
+
+    if profile['block_images']:
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+
+    # 画像・フォント・CSSのリクエストをブロック
+    blocked_urls = []
+    for key, patterns in BLOCKED_URL_PATTERNS.items():
+        if profile.get(key):
+            blocked_urls.extend(patterns)
+    if blocked_urls:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+
+    return driver
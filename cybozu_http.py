@@ -0,0 +1,263 @@
+"""CybozuにHTTPで直接アクセスするクライアント
+
+Chromeを起動せずにセッションCookieでログインし、
+ScheduleIndex（tblgroupweek）のHTMLを取得・解析する。
+"""
+import http.cookiejar
+import json
+import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+
+# CybozuのベースURL（ローカルのテスト用サーバーに差し替え可能）
+CYBOZU_BASE_URL = 'https://9w4c9.cybozu.com'
+
+# HTTPリクエストのタイムアウト（秒）
+REQUEST_TIMEOUT = 30
+
+# 終了タグを持たない要素
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+
+class WeekPageParser(HTMLParser):
+    """tblgroupweekテーブルからイベント情報を抽出するパーサー
+
+    Seleniumでの取得と同じく、eventcell配下のeventInnerごとに
+    eventDateTimeのテキストとeventのhref・titleを取り出す。
+    """
+
+    def __init__(self, page_url=''):
+        super().__init__()
+        self.page_url = page_url
+        self.found_table = False
+        self.items = []
+        # (タグ名, 役割) のスタック
+        self.stack = []
+        self.current = None
+        self.time_depth = None
+        self.time_text = []
+
+    def _roles(self):
+        return [role for _, role in self.stack]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        roles = self._roles()
+
+        role = None
+        if attrs.get('id') == 'tblgroupweek':
+            role = 'table'
+            self.found_table = True
+        elif 'table' in roles and 'eventcell' in classes:
+            role = 'eventcell'
+        elif 'eventcell' in roles and 'eventInner' in classes and self.current is None:
+            role = 'eventInner'
+            self.current = {'href': None, 'title': None, 'time_text': None, 'has_event': False}
+        elif self.current is not None:
+            if 'eventDateTime' in classes and self.current['time_text'] is None and self.time_depth is None:
+                role = 'eventDateTime'
+                self.time_depth = len(self.stack)
+                self.time_text = []
+            elif 'event' in classes and not self.current['has_event']:
+                href = attrs.get('href')
+                self.current['href'] = urljoin(self.page_url, href) if href is not None else None
+                self.current['title'] = attrs.get('title')
+                self.current['has_event'] = True
+
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, role))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # 対応する開始タグまでスタックを戻す（閉じ忘れのタグも考慮）
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                while len(self.stack) > index:
+                    _, role = self.stack.pop()
+                    self._close(role)
+                return
+
+    def _close(self, role):
+        if role == 'eventDateTime':
+            self.current['time_text'] = ' '.join(''.join(self.time_text).split())
+            self.time_depth = None
+        elif role == 'eventInner':
+            if self.current['has_event']:
+                self.items.append({
+                    'href': self.current['href'],
+                    'title': self.current['title'],
+                    'time_text': self.current['time_text']
+                })
+            self.current = None
+
+    def handle_data(self, data):
+        if self.time_depth is not None:
+            self.time_text.append(data)
+
+
+def parse_week_items(html, page_url=''):
+    """ScheduleIndexのHTMLからイベント情報のリストを取得
+
+    Returns:
+        list | None: {href, title, time_text} のリスト。tblgroupweekがない場合はNone
+    """
+    parser = WeekPageParser(page_url)
+    parser.feed(html)
+    parser.close()
+    if not parser.found_table:
+        return None
+    return parser.items
+
+
+class ClassTextParser(HTMLParser):
+    """指定したクラスが付与された要素のテキストを抽出するパーサー"""
+
+    def __init__(self, class_name):
+        super().__init__()
+        self.class_name = class_name
+        self.texts = []
+        self.stack = []
+        self.depth = None
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_ELEMENTS:
+            return
+        classes = (dict(attrs).get('class') or '').split()
+        self.stack.append(tag)
+        if self.depth is None and self.class_name in classes:
+            self.depth = len(self.stack)
+            self.current = []
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        while self.stack:
+            if self.depth is not None and len(self.stack) == self.depth:
+                self.texts.append(' '.join(''.join(self.current).split()))
+                self.depth = None
+            if self.stack.pop() == tag:
+                break
+
+    def handle_data(self, data):
+        if self.depth is not None:
+            self.current.append(data)
+
+
+def parse_participant_names(html):
+    """予定詳細（ScheduleView）のHTMLから参加者名（participantクラス）のリストを取得"""
+    parser = ClassTextParser('participant')
+    parser.feed(html)
+    parser.close()
+    return parser.texts
+
+
+class CybozuHttpSession:
+    """セッションCookieを保持してCybozuにアクセスするHTTPクライアント
+
+    main.pyではWebDriverの代わりに渡せるよう、quit()を備えている。
+    """
+
+    def __init__(self, base_url=CYBOZU_BASE_URL, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookie_jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookie_jar)
+        )
+        self.current_url = None
+
+    def _open(self, request):
+        with self.opener.open(request, timeout=self.timeout) as response:
+            self.current_url = response.geturl()
+            charset = response.headers.get_content_charset() or 'utf-8'
+            return response.read().decode(charset, errors='replace')
+
+    def get(self, url):
+        """URLのHTMLを取得"""
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        return self._open(request)
+
+    def get_cookies(self):
+        """保持しているCookieをWebDriver.get_cookies()と同じ形式のリストで返す"""
+        cookies = []
+        for cookie in self.cookie_jar:
+            item = {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'secure': bool(cookie.secure)
+            }
+            if cookie.expires is not None:
+                item['expiry'] = cookie.expires
+            cookies.append(item)
+        return cookies
+
+    def add_cookie(self, cookie):
+        """Cookieを追加（WebDriver.add_cookie()と同じ形式の辞書）"""
+        domain = cookie.get('domain') or urlparse(self.base_url).hostname
+        self.cookie_jar.set_cookie(http.cookiejar.Cookie(
+            version=0,
+            name=cookie['name'],
+            value=cookie['value'],
+            port=None,
+            port_specified=False,
+            domain=domain,
+            domain_specified=domain.startswith('.'),
+            domain_initial_dot=domain.startswith('.'),
+            path=cookie.get('path', '/'),
+            path_specified=True,
+            secure=cookie.get('secure', False),
+            expires=cookie.get('expiry'),
+            discard=cookie.get('expiry') is None,
+            comment=None,
+            comment_url=None,
+            rest={}
+        ))
+
+    def login(self, username, password):
+        """Cybozuにログイン（セッションCookieを取得）"""
+        body = json.dumps({
+            'username': username,
+            'password': password,
+            'keepUsername': False,
+            'redirect': ''
+        }).encode('utf-8')
+        request = urllib.request.Request(
+            f'{self.base_url}/api/auth/login.json',
+            data=body,
+            headers={
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest',
+                'User-Agent': 'Mozilla/5.0'
+            }
+        )
+        result = json.loads(self._open(request) or '{}')
+        if not result.get('success'):
+            raise RuntimeError(f'ログインに失敗しました: {result}')
+
+        # サイボウズOfficeのセッションを確立
+        self.get(f'{self.base_url}/o/')
+
+    def fetch_week_items(self, url):
+        """ScheduleIndexページを取得してイベント情報のリストを返す"""
+        html = self.get(url)
+        return parse_week_items(html, self.current_url or url)
+
+    def fetch_participant_names(self, url):
+        """予定詳細ページを取得して参加者名のリストを返す"""
+        return parse_participant_names(self.get(url))
+
+    def quit(self):
+        """セッションを破棄"""
+        self.cookie_jar.clear()
@@ -0,0 +1,170 @@
+"""Cybozuへのログインとセッションの再利用
+
+ログイン後のCookieを暗号化してファイルに保存し、次回の実行ではCookieを復元して
+1回のリクエストで有効かを確認する。期限切れの場合のみログイン画面からログインし直す。
+main.py / insert.py / sync_schedule_test.py で共通に使う。
+"""
+import json
+import os
+from cryptography.fernet import Fernet, InvalidToken
+from selenium.webdriver.common.by import By
+from cybozu_http import CybozuHttpSession, CYBOZU_BASE_URL
+from waits import wait_for_element, wait_for_url_change, wait_for_page_load
+
+
+# Cybozuのログイン情報
+CYBOZU_USERNAME = 'to-murakami'
+CYBOZU_PASSWORD = 'to-murakami@akioka55'
+
+# ログイン済みCookieの保存先（暗号化して保存）
+SESSION_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cybozu_session')
+
+# 暗号化キー（環境変数 CYBOZU_SESSION_KEY が未設定の場合は、このファイルに生成して保存）
+SESSION_KEY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cybozu_session_key')
+
+# セッションの有効性を確認するページのパス（未ログインの場合はログイン画面に転送される）
+SESSION_CHECK_PATH = '/o/'
+
+
+def get_cipher():
+    """Cookieの暗号化に使うFernetを取得（キーがなければ生成）"""
+    key = os.environ.get('CYBOZU_SESSION_KEY')
+    if not key:
+        try:
+            with open(SESSION_KEY_FILE, 'rb') as f:
+                key = f.read().strip()
+        except FileNotFoundError:
+            key = Fernet.generate_key()
+            # 所有者のみ読み書きできる権限で作成
+            fd = os.open(SESSION_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(key)
+    return Fernet(key)
+
+
+def load_session_cookies():
+    """保存したCookieを読み込む（ない・復号できない場合はNone）"""
+    try:
+        with open(SESSION_CACHE_FILE, 'rb') as f:
+            token = f.read()
+        return json.loads(get_cipher().decrypt(token).decode('utf-8'))
+    except FileNotFoundError:
+        return None
+    except (InvalidToken, ValueError) as e:
+        print(f'保存したセッションを読み込めませんでした: {e}')
+        return None
+
+
+def save_session_cookies(cookies):
+    """Cookieを暗号化して保存"""
+    try:
+        token = get_cipher().encrypt(json.dumps(cookies).encode('utf-8'))
+        fd = os.open(SESSION_CACHE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+    except OSError as e:
+        print(f'セッションの保存エラー: {e}')
+
+
+def clear_session_cookies():
+    """保存したCookieを削除"""
+    try:
+        os.remove(SESSION_CACHE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def get_base_url(driver):
+    """セッションの接続先のベースURL（CybozuHttpSessionは作成時に指定したURL）"""
+    if isinstance(driver, CybozuHttpSession):
+        return driver.base_url
+    return CYBOZU_BASE_URL
+
+
+def is_logged_in(driver):
+    """ログイン済みかを確認（確認用ページがログイン画面に転送されないか）"""
+    check_url = f'{get_base_url(driver)}{SESSION_CHECK_PATH}'
+    if isinstance(driver, CybozuHttpSession):
+        driver.get(check_url)
+    else:
+        driver.get(check_url)
+        wait_for_page_load(driver, 'service_open')
+    return '/login' not in (driver.current_url or '')
+
+
+def restore_session(driver):
+    """保存したCookieでログイン状態を復元
+
+    Returns:
+        bool: 復元できた場合True（期限切れ・保存なしの場合False）
+    """
+    cookies = load_session_cookies()
+    if not cookies:
+        return False
+
+    # WebDriverはCookieのドメインのページを開いてからでないと追加できない
+    if not isinstance(driver, CybozuHttpSession):
+        driver.get(f'{get_base_url(driver)}/login')
+
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print(f'Cookieの復元エラー: {cookie.get("name")} - {e}')
+
+    if is_logged_in(driver):
+        return True
+
+    # 期限切れのセッションは削除
+    clear_session_cookies()
+    return False
+
+
+def login_with_password(driver):
+    """ログイン画面からユーザー名・パスワードでログイン"""
+    # HTTPバックエンドの場合はログインAPIでセッションCookieを取得
+    if isinstance(driver, CybozuHttpSession):
+        driver.login(CYBOZU_USERNAME, CYBOZU_PASSWORD)
+        return
+
+    # 指定したURLにアクセス
+    url = f'{CYBOZU_BASE_URL}/'
+    driver.get(url)
+
+    # username-:0-textというIDが付与されたinputにユーザー名を入力
+    input_element = wait_for_element(driver, 'login_form', By.ID, 'username-:0-text')
+    input_element.send_keys(CYBOZU_USERNAME)
+
+    # password-:1-textというIDが付与されたinput要素にパスワードを入力
+    password_element = driver.find_element(By.ID, 'password-:1-text')
+    password_element.send_keys(CYBOZU_PASSWORD)
+
+    # login-buttonというクラスが付与された要素をクリック
+    login_button = driver.find_element(By.CLASS_NAME, 'login-button')
+    login_button.click()
+
+    # c-index-Services-ServiceItemが付与されたクラスの配下にあるa要素をクリック
+    service_item = wait_for_element(driver, 'login_complete', By.CLASS_NAME, 'c-index-Services-ServiceItem')
+    link = service_item.find_element(By.TAG_NAME, 'a')
+    services_url = driver.current_url
+    link.click()
+
+    # サイボウズOfficeへの遷移を待機
+    wait_for_url_change(driver, 'service_open', services_url)
+
+
+def login(driver):
+    """Cybozuにログイン
+
+    保存したセッションが有効な場合はそれを使い、期限切れの場合のみ
+    ログイン画面からログインしてセッションを保存し直す。
+
+    Args:
+        driver: WebDriverまたはCybozuHttpSession
+    """
+    if restore_session(driver):
+        print('保存したセッションでログインしました')
+        return
+
+    login_with_password(driver)
+    save_session_cookies(driver.get_cookies())
@@ -0,0 +1,306 @@
+"""データベース接続の共通処理
+
+main.py / insert.py / app.py で共通に使う。
+接続プールから接続を貸し出し、実行中に接続が切れた場合は再接続する。
+繰り返し実行するクエリはサーバー側のプリペアドステートメントで実行し、
+クエリごとの実行時間を計測して集計する。
+"""
+import re
+import threading
+import time
+import mysql.connector
+from mysql.connector import Error, errorcode, pooling
+
+
+# データベース設定
+DB_CONFIG = {
+    'host': 'akioka.cloud',
+    'database': 'akioka_db',
+    'user': 'akioka_administrator',
+    'password': 'Akiokapass0',  # パスワードを設定してください
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci'
+}
+
+# 接続プールの設定
+POOL_NAME = 'akioka_pool'
+POOL_SIZE = 4
+
+# 接続が切れた場合の再接続の試行回数と間隔（秒）
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = 2
+
+# この時間（秒）以上使われていない接続は、次のクエリの前に疎通を確認する
+KEEPALIVE_INTERVAL = 60
+
+# 接続が切れたことを表すエラーコード
+CONNECTION_LOST_ERRORS = {
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+    errorcode.CR_SERVER_LOST_EXTENDED,
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR
+}
+
+# クエリごとの実行時間の計測結果 {クエリ名: {'count', 'total', 'max'}}
+query_metrics = {}
+# 再接続した回数
+reconnect_count = 0
+_metrics_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def record_query(name, elapsed):
+    """クエリの実行時間を記録"""
+    with _metrics_lock:
+        metric = query_metrics.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+        metric['count'] += 1
+        metric['total'] += elapsed
+        metric['max'] = max(metric['max'], elapsed)
+
+
+def query_name(sql):
+    """計測結果の集計単位（操作とテーブル名）をSQLから求める 例: "SELECT schedule_events" """
+    match = re.search(r'^\s*(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER)\b', sql, re.IGNORECASE)
+    if not match:
+        return ' '.join(sql.split())[:40]
+    operation = match.group(1).upper()
+    table = re.search(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)', sql, re.IGNORECASE)
+    return f'{operation} {table.group(1)}' if table else operation
+
+
+def is_connection_lost(error):
+    """接続が切れたことによるエラーかを判定"""
+    return getattr(error, 'errno', None) in CONNECTION_LOST_ERRORS
+
+
+class LockLostError(Error):
+    """再接続したときに、名前付きロック（GET_LOCK）を取り直せなかったことを表すエラー
+
+    ロックは接続単位のため、接続が切れると解放される。取り直せなかった場合は
+    他のプロセスがロックを取得しているため、ロックを取り直すまでこの接続ではクエリを実行しない。
+    """
+
+
+def get_pool():
+    """接続プールを取得（初回のみ作成）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pooling.MySQLConnectionPool(pool_name=POOL_NAME, pool_size=POOL_SIZE, **DB_CONFIG)
+        return _pool
+
+
+class TrackedCursor:
+    """実行時間の計測と、接続が切れた場合の再実行を行うカーソル"""
+
+    def __init__(self, session, **options):
+        self.session = session
+        self.options = options
+        self.cursor = session.raw.cursor(**options)
+        self.generation = session.generation
+
+    def execute(self, sql, params=()):
+        self.session.run(self, sql, lambda cursor: cursor.execute(sql, params))
+
+    def executemany(self, sql, seq_params):
+        self.session.run(self, sql, lambda cursor: cursor.executemany(sql, seq_params))
+
+    def reopen(self):
+        """再接続後の接続でカーソルを作り直す"""
+        self.cursor = self.session.raw.cursor(**self.options)
+        self.generation = self.session.generation
+
+    def close(self):
+        try:
+            self.cursor.close()
+        except Error:
+            pass  # 切断済みの接続のカーソルは閉じられなくても問題ない
+
+    def __getattr__(self, name):
+        # fetchall / fetchone / lastrowid / rowcount などは元のカーソルに委譲
+        return getattr(self.cursor, name)
+
+
+class DatabaseSession:
+    """接続プールから借りた接続のラッパー
+
+    cursor() は TrackedCursor を返す。接続が切れていた場合は再接続し、
+    未コミットの書き込みがなければ同じクエリを1回だけ再実行する
+    （書き込みの途中で切れた場合は例外をそのまま呼び出し元に返し、やり直してもらう）。
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.generation = 0
+        self.in_transaction = False
+        self.last_used = time.monotonic()
+        self.prepared_cursors = {}
+        # 取得中の名前付きロックと、再接続で取り直せなかったロック
+        self.locks = set()
+        self.lost_locks = set()
+
+    def cursor(self, **options):
+        return TrackedCursor(self, **options)
+
+    def execute_prepared(self, sql, params=()):
+        """サーバー側のプリペアドステートメントでクエリを実行して全行を返す
+
+        SQLごとにカーソルを保持するため、2回目以降はステートメントの解析を省略できる。
+        コネクタは直前と同じ文字列オブジェクト（is で比較）の場合のみステートメントを再利用するため、
+        同じ内容のSQLでも最初に渡された文字列オブジェクトで実行する。
+        """
+        entry = self.prepared_cursors.get(sql)
+        if entry is None:
+            entry = self.prepared_cursors[sql] = (TrackedCursor(self, prepared=True), sql)
+        cursor, prepared_sql = entry
+        cursor.execute(prepared_sql, params)
+        return cursor.fetchall()
+
+    def get_lock(self, name, timeout=0):
+        """名前付きロック（GET_LOCK）を取得（再接続した場合は自動で取り直す）
+
+        Returns:
+            bool: 取得できた場合True（他の接続が取得している場合False）
+        """
+        was_lost = name in self.lost_locks
+        self.lost_locks.discard(name)
+        cursor = self.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+            result = cursor.fetchone()
+        finally:
+            cursor.close()
+
+        if result and result[0] == 1:
+            self.locks.add(name)
+            return True
+        if was_lost:
+            self.lost_locks.add(name)
+        return False
+
+    def release_lock(self, name):
+        """名前付きロックを解放"""
+        self.locks.discard(name)
+        self.lost_locks.discard(name)
+        cursor = self.cursor()
+        try:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def reacquire_locks(self):
+        """再接続後にロックを取り直す（取り直せなかった場合はLockLostError）"""
+        for name in list(self.locks):
+            cursor = self.raw.cursor()
+            try:
+                cursor.execute("SELECT GET_LOCK(%s, 0)", (name,))
+                result = cursor.fetchone()
+            finally:
+                cursor.close()
+            if not (result and result[0] == 1):
+                self.locks.discard(name)
+                self.lost_locks.add(name)
+
+        if self.lost_locks:
+            raise LockLostError(msg=f'再接続後にロックを取り直せませんでした: {", ".join(sorted(self.lost_locks))}')
+
+    def run(self, tracked, sql, action):
+        """カーソルでクエリを実行（計測・キープアライブ・再接続）"""
+        if self.lost_locks:
+            raise LockLostError(msg=f'ロックが解放されたため実行できません: {", ".join(sorted(self.lost_locks))}')
+        self.keepalive()
+        if tracked.generation != self.generation:
+            tracked.reopen()
+
+        start = time.perf_counter()
+        try:
+            try:
+                action(tracked.cursor)
+            except (mysql.connector.OperationalError, mysql.connector.InterfaceError) as e:
+                if not is_connection_lost(e):
+                    raise
+                had_writes = self.in_transaction
+                self.reconnect()
+                if had_writes:
+                    raise
+                tracked.reopen()
+                action(tracked.cursor)
+        finally:
+            record_query(query_name(sql), time.perf_counter() - start)
+            self.last_used = time.monotonic()
+
+        if sql.lstrip()[:6].upper() != 'SELECT':
+            self.in_transaction = True
+
+    def keepalive(self):
+        """しばらく使われていない接続の疎通を確認（未コミットの書き込みがない場合のみ再接続する）"""
+        if self.in_transaction or time.monotonic() - self.last_used < KEEPALIVE_INTERVAL:
+            return
+        try:
+            self.raw.ping(reconnect=False)
+        except Error:
+            self.reconnect()
+
+    def reconnect(self):
+        """接続し直す（作成済みのカーソルは次の実行時に作り直される。ロックは取り直す）"""
+        global reconnect_count
+        print('データベースへの接続が切れたため再接続します...')
+        self.raw.reconnect(attempts=RECONNECT_ATTEMPTS, delay=RECONNECT_DELAY)
+        self.generation += 1
+        self.in_transaction = False
+        with _metrics_lock:
+            reconnect_count += 1
+        # 接続が切れるとロックも解放されるため取り直す
+        self.reacquire_locks()
+
+    def commit(self):
+        self.raw.commit()
+        self.in_transaction = False
+
+    def rollback(self):
+        self.raw.rollback()
+        self.in_transaction = False
+
+    def close(self):
+        """接続をプールに返す"""
+        for cursor, _ in self.prepared_cursors.values():
+            cursor.close()
+        self.prepared_cursors = {}
+        self.raw.close()
+
+    def __getattr__(self, name):
+        # is_connected などは元の接続に委譲
+        return getattr(self.raw, name)
+
+
+def get_db_connection():
+    """接続プールからデータベース接続を取得（失敗した場合はNone）"""
+    try:
+        return DatabaseSession(get_pool().get_connection())
+    except Error as e:
+        print(f'データベース接続エラー: {e}')
+        return None
+
+
+def reset_query_metrics():
+    """クエリの計測結果と再接続回数をクリア（デーモンモードで同期ごとに集計し直す場合）"""
+    global reconnect_count
+    with _metrics_lock:
+        query_metrics.clear()
+        reconnect_count = 0
+
+
+def format_query_metrics():
+    """クエリの実行時間の集計結果をログ用の文字列リストで返す"""
+    lines = []
+    with _metrics_lock:
+        for name, metric in sorted(query_metrics.items()):
+            average = metric['total'] / metric['count'] if metric['count'] else 0.0
+            lines.append(f'{name}: {metric["count"]}回 / 合計{metric["total"]:.2f}秒 / 平均{average * 1000:.1f}ms / 最大{metric["max"] * 1000:.1f}ms')
+        if reconnect_count:
+            lines.append(f'再接続: {reconnect_count}回')
+    return lines
@@ -0,0 +1,107 @@
+"""施設マスタ（facilitiesテーブル）の管理
+
+設定した施設一覧（施設名とサイボウズの施設ID）を起動時にまとめて登録し、
+以降の施設名 → 施設IDの解決はメモリ上で行う。main.py と insert.py で共通に使う。
+"""
+from mysql.connector import Error
+
+
+# 施設一覧（施設名: サイボウズの施設ID）※施設ＩＤ.txt の施設選択肢の値
+FACILITIES = {
+    '社長室': 340,
+    '応接室': 339,
+    '事務室面談テーブル': 341,
+    '社員休憩室': 342,
+    '二階食堂': 343,
+    '技術室': 660,
+    '技術室奥(3Dスキャナ)': 661,
+    '品証検査場2F西': 662,
+    '品証検査場2F東': 663,
+    '社外会議室': 654
+}
+
+# 予定を同期する施設（FACILITIESのうち週表示を取得する施設）
+SYNC_FACILITIES = ['社長室', '応接室', '事務室面談テーブル', '社員休憩室', '二階食堂']
+
+
+class FacilityRegistry:
+    """施設名 → 施設ID・サイボウズの施設IDの索引（実行中はメモリ上で解決する）
+
+    facilitiesテーブルを1回のクエリで読み込み、設定と異なる施設だけを
+    複数行INSERT ... ON DUPLICATE KEY UPDATE でまとめて登録する。
+    """
+
+    def __init__(self, connection, facilities=None):
+        """
+        Args:
+            facilities: 登録する施設一覧（施設名: サイボウズの施設ID）。Noneの場合は登録しない
+        """
+        self.connection = connection
+        self.by_name = {}
+        self.load()
+        if facilities:
+            self.upsert(facilities)
+
+    def load(self):
+        """facilitiesテーブルから索引を読み込み直す"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, name, cybozu_id FROM facilities")
+        rows = cursor.fetchall()
+        cursor.close()
+
+        self.by_name = {name: {'id': facility_id, 'cybozu_id': cybozu_id} for facility_id, name, cybozu_id in rows}
+
+    def upsert(self, facilities):
+        """施設一覧を一括登録（未登録・サイボウズの施設IDが異なる施設のみ書き込む）
+
+        Returns:
+            int: 書き込んだ施設数
+        """
+        rows = [
+            (name, cybozu_id)
+            for name, cybozu_id in facilities.items()
+            if name not in self.by_name or self.by_name[name]['cybozu_id'] != cybozu_id
+        ]
+        if not rows:
+            return 0
+
+        cursor = self.connection.cursor()
+        try:
+            placeholders = ', '.join(['(%s, %s, NOW(), NOW())'] * len(rows))
+            cursor.execute(f"""
+                INSERT INTO facilities (name, cybozu_id, created_at, updated_at)
+                VALUES {placeholders}
+                ON DUPLICATE KEY UPDATE
+                    cybozu_id = VALUES(cybozu_id),
+                    updated_at = NOW()
+            """, tuple(value for row in rows for value in row))
+            self.connection.commit()
+        except Error:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        # 採番された施設IDを取得するため読み込み直す
+        self.load()
+        return len(rows)
+
+    def resolve(self, name):
+        """施設名から施設IDを取得（未登録の場合は作成）"""
+        facility = self.by_name.get(name)
+        if facility:
+            return facility['id']
+
+        cursor = self.connection.cursor()
+        cursor.execute("INSERT INTO facilities (name, created_at, updated_at) VALUES (%s, NOW(), NOW())", (name,))
+        self.connection.commit()
+        facility_id = cursor.lastrowid
+        cursor.close()
+
+        self.by_name[name] = {'id': facility_id, 'cybozu_id': None}
+        return facility_id
+
+    def get_cybozu_id(self, name):
+        """施設名からサイボウズの施設IDを取得（未設定の場合はNone）"""
+        facility = self.by_name.get(name)
+        return facility['cybozu_id'] if facility else None
@@ -1,27 +1,23 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import Select
-from webdriver_manager.chrome import ChromeDriverManager
-import time
-import mysql.connector
+from selenium.common.exceptions import TimeoutException
+from browser import create_driver
+from cybozu_session import login
+from facilities import FacilityRegistry, FACILITIES
+from waits import wait_for, wait_for_element, wait_for_clickable, wait_for_url_change, format_wait_metrics
 from mysql.connector import Error
+from db import DB_CONFIG, get_db_connection
+from names import normalize_user_name
 from datetime import datetime
 
 
-# データベース設定
-DB_CONFIG = {
-    'host': 'akioka.cloud',
-    'database': 'akioka_db',
-    'user': 'akioka_administrator',
-    'password': 'Akiokapass0',
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci'
-}
-
 # ログファイルのパス
 LOG_FILE = 'insert.log'
 
+# ブラウザのプロファイル（browser.BROWSER_PROFILESのキー）
+# 'production': ヘッドレス・画像等をブロック / 'interactive': 画面を表示してデバッグ
+BROWSER_PROFILE = 'production'
+
 
 def write_log(message, log_file=LOG_FILE):
     """ログファイルにメッセージを書き込む"""
@@ -32,16 +28,6 @@ def write_log(message, log_file=LOG_FILE):
         print(f'ログ書き込みエラー: {e}')
 
 
-def get_db_connection():
-    """MySQLデータベースへの接続を取得"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f'データベース接続エラー: {e}')
-        return None
-
-
 def convert_date_to_cybozu_format(date_value):
     """日付をCybozu形式(da.YYYY.M.D)に変換"""
     if isinstance(date_value, str):
@@ -75,6 +61,48 @@ def get_participants_for_event(connection, event_id):
         return []
 
 
+# 参加者検索の結果（候補の選択肢）のテキストを取得するスクリプト
+# 候補のselectは、追加ボタン（.vr_selectButtons）の直前にあるselect（後ろは選択済みの参加者）
+SEARCH_RESULT_OPTIONS_SCRIPT = """
+    var buttons = document.querySelector('.vr_selectButtons');
+    if (!buttons) {
+        return [];
+    }
+    var container = buttons.parentNode;
+    var result = null;
+    while (container && !result) {
+        var selects = container.getElementsByTagName('select');
+        for (var i = 0; i < selects.length; i++) {
+            if (selects[i].compareDocumentPosition(buttons) & Node.DOCUMENT_POSITION_FOLLOWING) {
+                result = selects[i];
+            }
+        }
+        container = container.parentNode;
+    }
+    if (!result) {
+        return [];
+    }
+    var texts = [];
+    for (var j = 0; j < result.options.length; j++) {
+        texts.push(result.options[j].text);
+    }
+    return texts;
+"""
+
+
+def search_result_contains(name):
+    """参加者検索の結果（候補の選択肢）に指定した名前が表示されたかを判定する条件
+
+    選択済みの参加者の選択肢は対象外。全角・半角と空白の違いは無視して比較する。
+    """
+    normalized_name = normalize_user_name(name)
+
+    def condition(driver):
+        texts = driver.execute_script(SEARCH_RESULT_OPTIONS_SCRIPT) or []
+        return any(normalized_name in normalize_user_name(text) for text in texts)
+    return condition
+
+
 def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
     """Cybozuのスケジュール登録フォームにアクセスして時刻を設定"""
     print(f'\n--- スケジュール登録処理開始 (ID: {event["id"]}) ---')
@@ -92,9 +120,9 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
         url = f"https://9w4c9.cybozu.com/o/ag.cgi?page=ScheduleEntry&UID=796&GID=&Date={cybozu_date}&BDate={cybozu_date}&CP="
         print(f'アクセスURL: {url}')
         
-        # URLにアクセス
+        # URLにアクセスし、登録フォームが表示されるまで待機
         driver.get(url)
-        time.sleep(2)
+        wait_for_element(driver, 'entry_form', By.CLASS_NAME, 'SetTimeHourScheduleEntry')
         
         # 開始時刻を時と分に分割
         start_time_parts = event["start_datetime"].split(':')
@@ -124,7 +152,6 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
         print(f'  開始分を設定: {start_minute}')
         
         print('開始時刻の設定が完了しました')
-        time.sleep(0.5)
         
         # 終了時刻を時と分に分割
         end_time_parts = event["end_datetime"].split(':')
@@ -154,7 +181,6 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
         print(f'  終了分を設定: {end_minute}')
         
         print('終了時刻の設定が完了しました')
-        time.sleep(0.5)
         
         # タイトルを入力
         print(f'タイトルを入力: {event["title"]}')
@@ -163,7 +189,6 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
         title_input.clear()
         title_input.send_keys(event["title"])
         print('タイトルの入力が完了しました')
-        time.sleep(0.5)
         
         # 参加者を取得
         participants = get_participants_for_event(connection, event["id"])
@@ -177,30 +202,32 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
                 participant_input = driver.find_element(By.NAME, 'sUIDUserSearchText')
                 participant_input.clear()
                 participant_input.send_keys(participant_name)
-                time.sleep(0.5)
-                
+
                 # 検索ボタンをクリック
                 search_button = driver.find_element(By.CLASS_NAME, 'searchButton')
                 search_button.click()
                 print(f'    検索ボタンをクリック')
-                time.sleep(1)
-                
+
+                # 検索結果に参加者が表示されるまで待機
+                try:
+                    wait_for(driver, 'search_results', search_result_contains(participant_name))
+                except TimeoutException:
+                    # 表示中の候補は前回の検索結果や別人の可能性があるため追加しない
+                    print(f'    警告: 検索結果に「{participant_name}」が表示されなかったため、追加をスキップします')
+                    continue
+
                 # 追加ボタンをクリック
-                vr_select_buttons = driver.find_element(By.CLASS_NAME, 'vr_selectButtons')
-                buttons = vr_select_buttons.find_elements(By.TAG_NAME, 'button')
-                if buttons:
-                    buttons[0].click()  # 最初のボタンをクリック
+                try:
+                    add_button = wait_for_clickable(driver, 'search_results', By.CSS_SELECTOR, '.vr_selectButtons button')
+                    add_button.click()  # 最初のボタンをクリック
                     print(f'    追加ボタンをクリック')
-                else:
+                except TimeoutException:
                     print(f'    警告: 追加ボタンが見つかりませんでした')
-                time.sleep(0.5)
                 
             print(f'全参加者の入力が完了しました ({len(participants)}人)')
         else:
             print('参加者が見つかりませんでした')
-        
-        time.sleep(1)
-        
+
         # 施設を設定
         if event.get("facility_cybozu_id"):
             print(f'施設IDを設定: {event["facility_cybozu_id"]}')
@@ -208,7 +235,6 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
             select_fcid = Select(fcid_select)
             select_fcid.select_by_value(str(event["facility_cybozu_id"]))
             print('施設の設定が完了しました')
-            time.sleep(0.5)
             
             # 施設追加ボタンをクリック
             vr_select_buttons_list = driver.find_elements(By.CLASS_NAME, 'vr_selectButtons')
@@ -220,22 +246,22 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
                 if buttons:
                     buttons[0].click()
                     print('施設追加ボタンをクリックしました')
-                    time.sleep(0.5)
                 else:
                     print('警告: 施設追加ボタンが見つかりませんでした')
             else:
                 print('警告: vr_selectButtonsが2つ見つかりませんでした')
         else:
             print('施設IDが設定されていません')
-        
-        time.sleep(1)
-        
+
         # 送信ボタンをクリック
         print('スケジュールを送信中...')
         submit_button = driver.find_element(By.CLASS_NAME, 'vr_hotButton')
+        entry_url = driver.current_url
         submit_button.click()
         print('送信ボタンをクリックしました')
-        time.sleep(2)
+
+        # 送信後の画面遷移を待機
+        wait_for_url_change(driver, 'submit', entry_url)
         
         # statusを0に更新（登録完了）
         try:
@@ -265,34 +291,6 @@ def register_schedule_to_cybozu(driver, connection, event, log_messages=None):
         return False
 
 
-def login(driver):
-    """Cybozuにログイン"""
-    # 指定したURLにアクセス
-    url = 'https://9w4c9.cybozu.com/'
-    driver.get(url)
-
-    # username-:0-textというIDが付与されたinputにto-murakamiと入力
-    input_element = driver.find_element(By.ID, 'username-:0-text')
-    input_element.send_keys('to-murakami')
-
-    # password-:1-textというIDが付与されたinput要素にto-murakami@akioka55と入力
-    password_element = driver.find_element(By.ID, 'password-:1-text')
-    password_element.send_keys('to-murakami@akioka55')
-
-    # login-buttonというクラスが付与された要素をクリック
-    login_button = driver.find_element(By.CLASS_NAME, 'login-button')
-    login_button.click()
-
-    time.sleep(1)
-    
-    # c-index-Services-ServiceItemが付与されたクラスの配下にあるa要素をクリック
-    service_item = driver.find_element(By.CLASS_NAME, 'c-index-Services-ServiceItem')
-    link = service_item.find_element(By.TAG_NAME, 'a')
-    link.click()
-    
-    time.sleep(1)
-
-
 def main():
     # 開始時刻を記録
     start_time = datetime.now()
@@ -319,6 +317,19 @@ def main():
         return
     
     print('データベース接続成功')
+
+    # 施設マスタを読み込み、設定した施設一覧をまとめて登録
+    try:
+        facility_registry = FacilityRegistry(connection, FACILITIES)
+    except Error as e:
+        error_msg = f'施設マスタの読み込みに失敗しました: {e}'
+        print(error_msg)
+        log_messages.append(f'■ エラー: {error_msg}')
+        log_messages.append('=' * 80)
+        log_messages.append('')
+        write_log('\n'.join(log_messages))
+        connection.close()
+        return
     
     # schedule_eventsテーブルからデータを取得
     print('')
@@ -348,7 +359,6 @@ def main():
                     se.id,
                     se.facility_id,
                     f.name as facility_name,
-                    f.cybozu_id as facility_cybozu_id,
                     se.date,
                     se.title,
                     se.start_datetime,
@@ -368,7 +378,6 @@ def main():
                     se.id,
                     se.facility_id,
                     f.name as facility_name,
-                    f.cybozu_id as facility_cybozu_id,
                     se.date,
                     se.title,
                     se.start_datetime,
@@ -383,6 +392,10 @@ def main():
         cursor.execute(query)
         events = cursor.fetchall()
         cursor.close()
+
+        # サイボウズの施設IDは施設マスタの索引から設定
+        for event in events:
+            event['facility_cybozu_id'] = facility_registry.get_cybozu_id(event['facility_name'])
         
         if events:
             print(f'\n取得件数: {len(events)}件\n')
@@ -402,16 +415,12 @@ def main():
                     print(f'ステータス: {event["status"]}')
                 print('')
             
-            # Chromeブラウザのオプションを設定
             print('\n' + '=' * 60)
             print('ブラウザを起動します')
             print('=' * 60)
-            options = webdriver.ChromeOptions()
-            # options.add_argument('--headless')  # ヘッドレスモードにする場合はコメント解除
-
-            # Chromeブラウザのドライバーを設定
-            print('Chromeドライバーを起動中...')
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+            # Chromeブラウザを設定したプロファイルで起動
+            print(f'Chromeドライバーを起動中...（プロファイル: {BROWSER_PROFILE}）')
+            driver = create_driver(BROWSER_PROFILE, 'insert')
 
             # ログイン処理
             print('Cybozuにログイン中...')
@@ -436,10 +445,6 @@ def main():
                 else:
                     fail_count += 1
                     print('✗ 登録失敗')
-                
-                # 次のイベント処理前に少し待機
-                if idx < len(events):
-                    time.sleep(1)
             
             print('\n' + '=' * 60)
             print('スケジュール登録処理完了')
@@ -455,6 +460,16 @@ def main():
             log_messages.append(f'  成功: {success_count}件')
             log_messages.append(f'  失敗: {fail_count}件')
             log_messages.append(f'  合計: {len(events)}件')
+
+            # 待機時間の集計
+            wait_summary = format_wait_metrics()
+            if wait_summary:
+                print('待機時間:')
+                log_messages.append('')
+                log_messages.append('■ 待機時間')
+                for line in wait_summary:
+                    print(f'  {line}')
+                    log_messages.append(f'  {line}')
             
             # ブラウザを閉じる
             driver.quit()
@@ -1,222 +1,574 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import time
 import json
 from urllib.parse import quote, parse_qs, urlparse
 from datetime import datetime, timedelta
 import re
 import logging
-import mysql.connector
 from mysql.connector import Error
 import os
-
+import hashlib
+import queue
+import threading
+import argparse
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from cybozu_http import CybozuHttpSession, CYBOZU_BASE_URL
+from cybozu_session import login, is_logged_in, get_base_url
+from browser import create_driver
+from db import get_db_connection, format_query_metrics, reset_query_metrics, LockLostError
+from facilities import FacilityRegistry, FACILITIES, SYNC_FACILITIES
+from names import normalize_user_name
+from waits import wait_for_element, wait_for_page_load, format_wait_metrics, reset_wait_metrics
 
 
 # デバッグフラグ（Trueにすると処理を選択できる）
 DEBUG_FLG = False
 
-# データベース設定
-DB_CONFIG = {
-    'host': 'akioka.cloud',
-    'database': 'akioka_db',
-    'user': 'akioka_administrator',
-    'password': 'Akiokapass0',  # パスワードを設定してください
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci'
-}
-
 # ログファイルのパス
 LOG_FILE = 'log.txt'
 
 # 実行状態管理ファイル
 STATE_FILE = 'sync_state.json'
 
+# 参加者情報の取得状態（イベントごとのフィンガープリント）を保存するファイル
+PARTICIPANT_STATE_FILE = 'participant_state.json'
+
+# 内容が変わっていないイベントでも、この時間（時間）が経過したら参加者を再取得する
+PARTICIPANT_RECHECK_HOURS = 24
+
+# 参加者の差分をまとめてコミットするイベント数
+PARTICIPANT_BATCH_SIZE = 50
+
+# スケジュールの取得方式
+# 'selenium': Chromeを操作して取得 / 'http': HTTPでHTMLを直接取得して解析（高速）
+FETCH_BACKEND = 'selenium'
+
+# ブラウザのプロファイル（browser.BROWSER_PROFILESのキー）
+# 'production': ヘッドレス・画像等をブロック / 'interactive': 画面を表示してデバッグ
+BROWSER_PROFILE = 'production'
+
+# Seleniumでのイベント情報の取得方法
+# 'script': JavaScriptを1回実行してまとめて取得 / 'elements': 要素ごとにWebDriverで取得
+SELENIUM_EXTRACT_MODE = 'script'
+
+# tblgroupweek（arguments[0]）からイベント情報を取得するJavaScript
+# 要素ごとに取得する場合と同じく、eventcell配下のeventInnerごとに href / title / 時刻表示 を返す
+EXTRACT_EVENTS_SCRIPT = """
+var table = arguments[0];
+var items = [];
+var cells = table.getElementsByClassName('eventcell');
+for (var i = 0; i < cells.length; i++) {
+    var inners = cells[i].getElementsByClassName('eventInner');
+    for (var j = 0; j < inners.length; j++) {
+        var content = inners[j].getElementsByClassName('event')[0];
+        if (!content) {
+            continue;
+        }
+        var dateTime = inners[j].getElementsByClassName('eventDateTime')[0];
+        items.push({
+            href: content.href || content.getAttribute('href'),
+            title: content.getAttribute('title'),
+            time_text: dateTime ? dateTime.innerText.trim() : null
+        });
+    }
+}
+return JSON.stringify(items);
+"""
+
+# 週表示ページを並列取得するセッション数（1の場合は逐次取得）
+FETCH_WORKERS = 1
+
+# 同一ホストへの同時リクエスト数の上限
+MAX_REQUESTS_PER_HOST = 4
+
+# 一括書き込み時の1文あたりの最大行数
+WRITE_BATCH_SIZE = 500
+
+# 1ヶ月分の同期を行う時刻（時）
+FULL_SYNC_HOURS = (0, 12)
+
+# 同期対象の週数（今日から5週間分 ≒ 1ヶ月）
+SYNC_WEEKS = 5
+
+# 施設・ユーザー × 週ごとの同期状態（前回の同期時刻・平均変更件数）を保存するファイル
+SYNC_WINDOW_STATE_FILE = 'sync_windows.json'
+
+# 週ごとの基本の同期間隔（分）。今日からの距離（週）で決める（今週, 来週, 2週後, ...）
+SYNC_WINDOW_INTERVALS = [10, 60, 180, 360, 360]
+
+# 変更が多い週ほど同期間隔を短くする度合い（間隔 = 基本間隔 / (1 + 重み × 平均変更件数)）
+SYNC_WINDOW_CHANGE_WEIGHT = 1.0
+
+# 平均変更件数を更新するときの新しい結果の重み（指数移動平均）
+SYNC_WINDOW_SMOOTHING = 0.3
+
+# 通常同期で取得するページ数の上限（対象数 × この値。従来の1週間分の同期と同じページ数）
+SYNC_WINDOW_PAGES_PER_TARGET = 1
+
+# 施設・ユーザー × 週ごとに、前回同期したページのイベント一覧のハッシュを保存するファイル
+PAGE_CACHE_FILE = 'page_cache.json'
+
+# 同期処理の重複実行を防ぐロック名（MySQLのGET_LOCK）
+SYNC_LOCK_NAME = 'cybozu_schedule_sync'
+
+# デーモンモード（python main.py --daemon）の設定
+DAEMON_INTERVAL_MINUTES = 5      # 同期の間隔（分）
+DAEMON_JITTER_SECONDS = 30       # 実行時刻をずらす最大秒数（アクセスの集中を避ける）
+DAEMON_START_RETRY_SECONDS = 60  # 起動時に準備できなかった場合（cronの同期が実行中など）に再試行するまでの秒数
+USER_DIRECTORY_MAX_AGE = 600     # ユーザー索引を読み込み直す間隔（秒）
+
+# 同期対象の種類ごとの設定（施設予定とユーザー個人予定で共通の同期処理を使う）
+TARGET_KINDS = {
+    'facility': {
+        'label': '施設',                    # ログ表示名
+        'table': 'schedule_events',         # 予定を保存するテーブル
+        'owner_column': 'facility_id',      # 所有者を表すカラム
+        'counter_prefix': 'facility',       # 統計カウンターのキー
+        'require_time': False,              # 時刻指定なしの予定を除外するか
+        'stats_scope': 'facility',          # 集計テーブル（schedule_stats）の所有者ごとの件数のscope
+        'stats_total': 'events',            # 集計テーブルの合計件数のname
+        'stats_detail': True                # 集計テーブルに日付・バッジごとの件数も持つか
+    },
+    'user': {
+        'label': 'ユーザー',
+        'table': 'user_schedules',
+        'owner_column': 'user_id',
+        'counter_prefix': 'user',
+        'require_time': True,               # 終日予定などはユーザー予定として登録しない
+        'stats_scope': 'user',
+        'stats_total': 'user_events',
+        'stats_detail': False
+    }
+}
+
+# 週の範囲の既存イベントを取得するクエリ（種類ごと）
+# プリペアドステートメントを使い回せるよう、同じ文字列オブジェクトを毎回渡す
+# status=1 はinsert.pyがまだCybozuに登録していない予約（照合には使うが削除はしない）
+WEEK_EVENTS_QUERIES = {
+    kind: f"""
+        SELECT id, date, title, start_datetime, end_datetime, badge, description_url, EID, status
+        FROM {target['table']}
+        WHERE {target['owner_column']} = %s AND date BETWEEN %s AND %s
+    """
+    for kind, target in TARGET_KINDS.items()
+}
 
-def get_db_connection():
-    """MySQLデータベースへの接続を取得"""
+
+def migrate_create_tables(cursor):
+    """施設マスタ・予定・参加者・ユーザー予定テーブルを作成"""
+    # 施設マスタテーブル
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS facilities (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL UNIQUE,
+            cybozu_id INT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+    # 予定テーブル
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_events (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            facility_id INT NOT NULL,
+            date DATE NOT NULL,
+            title VARCHAR(500) NOT NULL,
+            start_datetime VARCHAR(10) NOT NULL,
+            end_datetime VARCHAR(10) NOT NULL,
+            badge VARCHAR(100),
+            description_url TEXT,
+            EID INT,
+            status TINYINT DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_event (facility_id, date, EID),
+            FOREIGN KEY (facility_id) REFERENCES facilities(id) ON DELETE CASCADE,
+            INDEX idx_facility_date (facility_id, date),
+            INDEX idx_date (date),
+            INDEX idx_status (status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+    # 参加者テーブル（Laravelマイグレーションを使用する場合は、この関数は使用されません）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_participants (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            schedule_event_id INT NOT NULL,
+            user_id INT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (schedule_event_id) REFERENCES schedule_events(id) ON DELETE CASCADE,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_participant (schedule_event_id, user_id),
+            INDEX idx_event (schedule_event_id),
+            INDEX idx_user (user_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+    # ユーザー予定テーブル
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_schedules (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            date DATE NOT NULL,
+            title VARCHAR(500) NOT NULL,
+            start_datetime VARCHAR(10) NOT NULL,
+            end_datetime VARCHAR(10) NOT NULL,
+            badge VARCHAR(100),
+            description_url TEXT,
+            EID INT,
+            status TINYINT DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            UNIQUE KEY unique_user_event (user_id, date, EID),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+            INDEX idx_user_date (user_id, date),
+            INDEX idx_date (date),
+            INDEX idx_status (status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def migrate_event_ids(cursor):
+    """既存テーブルにEIDカラムを追加し、UNIQUE制約を（日付, EID）単位に変更"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f'データベース接続エラー: {e}')
-        return None
+        # schedule_events テーブル
+        cursor.execute("ALTER TABLE schedule_events ADD COLUMN IF NOT EXISTS EID INT")
+    except Error:
+        pass  # カラムが既に存在する場合は無視
+
+    try:
+        # 古いUNIQUE制約を削除
+        cursor.execute("ALTER TABLE schedule_events DROP INDEX unique_event")
+    except Error:
+        pass  # 制約が既に削除されている場合は無視
+
+    try:
+        # 新しいUNIQUE制約を追加
+        cursor.execute("ALTER TABLE schedule_events ADD UNIQUE KEY unique_event (facility_id, date, EID)")
+    except Error:
+        pass  # 制約が既に存在する場合は無視
+
+    try:
+        # user_schedules テーブル
+        cursor.execute("ALTER TABLE user_schedules ADD COLUMN IF NOT EXISTS EID INT")
+    except Error:
+        pass  # カラムが既に存在する場合は無視
+
+    try:
+        # 古いUNIQUE制約を削除
+        cursor.execute("ALTER TABLE user_schedules DROP INDEX unique_user_event")
+    except Error:
+        pass  # 制約が既に削除されている場合は無視
+
+    try:
+        # 新しいUNIQUE制約を追加
+        cursor.execute("ALTER TABLE user_schedules ADD UNIQUE KEY unique_user_event (user_id, date, EID)")
+    except Error:
+        pass  # 制約が既に存在する場合は無視
+
+
+def migrate_status_columns(cursor):
+    """statusカラムを追加（存在しない場合）"""
+    try:
+        cursor.execute("ALTER TABLE schedule_events ADD COLUMN IF NOT EXISTS status TINYINT DEFAULT 0")
+        cursor.execute("ALTER TABLE schedule_events ADD INDEX IF NOT EXISTS idx_status (status)")
+    except Error:
+        pass  # カラムが既に存在する場合は無視
+
+    try:
+        cursor.execute("ALTER TABLE user_schedules ADD COLUMN IF NOT EXISTS status TINYINT DEFAULT 0")
+        cursor.execute("ALTER TABLE user_schedules ADD INDEX IF NOT EXISTS idx_status (status)")
+    except Error:
+        pass  # カラムが既に存在する場合は無視
+
+
+def migrate_facility_cybozu_id(cursor):
+    """施設マスタにサイボウズの施設IDカラムを追加（存在しない場合）"""
+    try:
+        cursor.execute("ALTER TABLE facilities ADD COLUMN IF NOT EXISTS cybozu_id INT")
+    except Error:
+        pass  # カラムが既に存在する場合は無視
+
 
+def rebuild_schedule_stats(cursor):
+    """集計テーブル（schedule_stats）を予定テーブルから作り直す（コミットは呼び出し側で行う）
 
-def init_database():
-    """データベースとテーブルを初期化"""
+    scope ごとの件数:
+        facility: 施設名ごとの予定数 / date: 日付ごとの予定数 / badge: バッジごとの予定数
+        user: ユーザーごとの個人予定数（user_schedules）
+        total: facilities・dates・events・user_events の合計
+    """
+    cursor.execute("DELETE FROM schedule_stats")
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        SELECT 'facility', f.name, COUNT(*)
+        FROM schedule_events se
+        JOIN facilities f ON se.facility_id = f.id
+        GROUP BY f.name
+    """)
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        SELECT 'date', CAST(date AS CHAR), COUNT(*)
+        FROM schedule_events
+        GROUP BY date
+    """)
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        SELECT 'badge', COALESCE(badge, ''), COUNT(*)
+        FROM schedule_events
+        GROUP BY COALESCE(badge, '')
+    """)
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        SELECT 'user', u.name, COUNT(*)
+        FROM user_schedules us
+        JOIN users u ON us.user_id = u.id
+        GROUP BY u.name
+    """)
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        SELECT 'total', 'facilities', COUNT(DISTINCT facility_id) FROM schedule_events
+        UNION ALL SELECT 'total', 'dates', COUNT(DISTINCT date) FROM schedule_events
+        UNION ALL SELECT 'total', 'events', COUNT(*) FROM schedule_events
+        UNION ALL SELECT 'total', 'user_events', COUNT(*) FROM user_schedules
+    """)
+
+
+def apply_schedule_stats(cursor, deltas):
+    """集計テーブル（schedule_stats）に件数の増減を反映（コミットは呼び出し側で行う）
+
+    予定の追加・削除と同じトランザクションで実行し、予定テーブルは読み直さない。
+    施設数・日付数は件数が残っている施設・日付の行数から求める。
+    同期以外（Laravel側など）で登録・削除された予定は、1ヶ月分の同期の作り直しで反映される。
+
+    Args:
+        deltas: {(scope, name): 増減}
+    """
+    rows = [(scope, name, delta) for (scope, name), delta in deltas.items() if delta]
+    if not rows:
+        return
+
+    for chunk in chunked(rows):
+        values = ', '.join(['(%s, %s, %s)'] * len(chunk))
+        cursor.execute(f"""
+            INSERT INTO schedule_stats (scope, name, event_count)
+            VALUES {values}
+            ON DUPLICATE KEY UPDATE event_count = event_count + VALUES(event_count)
+        """, tuple(value for row in chunk for value in row))
+    cursor.execute("DELETE FROM schedule_stats WHERE scope <> 'total' AND event_count <= 0")
+
+    cursor.execute("""
+        SELECT scope, COUNT(*) FROM schedule_stats
+        WHERE scope IN ('facility', 'date')
+        GROUP BY scope
+    """)
+    counts = dict(cursor.fetchall())
+    cursor.execute("""
+        INSERT INTO schedule_stats (scope, name, event_count)
+        VALUES ('total', 'facilities', %s), ('total', 'dates', %s)
+        ON DUPLICATE KEY UPDATE event_count = VALUES(event_count)
+    """, (counts.get('facility', 0), counts.get('date', 0)))
+
+
+def migrate_schedule_stats(cursor):
+    """Webアプリの統計用の集計テーブルを作成"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_stats (
+            scope VARCHAR(20) NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            event_count INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (scope, name)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    rebuild_schedule_stats(cursor)
+
+
+# スキーマのマイグレーション（バージョン, 説明, 実行する関数）。追加する場合は末尾に追記する
+MIGRATIONS = [
+    (1, 'テーブル作成', migrate_create_tables),
+    (2, 'EIDカラムとUNIQUE制約', migrate_event_ids),
+    (3, 'statusカラム', migrate_status_columns),
+    (4, '施設マスタのcybozu_idカラム', migrate_facility_cybozu_id),
+    (5, '統計の集計テーブル', migrate_schedule_stats)
+]
+
+# スキーマのバージョンを記録するテーブル
+SCHEMA_VERSION_TABLE = 'sync_schema_version'
+
+# マイグレーションのロック名と、ロックを待つ時間（秒）
+SCHEMA_MIGRATION_LOCK_NAME = 'sync_schema_migration'
+SCHEMA_MIGRATION_LOCK_TIMEOUT = 60
+
+
+def get_schema_version(connection):
+    """適用済みのスキーマバージョンを取得（管理テーブルがない場合は0）"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")
+        result = cursor.fetchone()
+        return result[0] or 0
+    except Error:
+        return 0
+    finally:
+        cursor.close()
+
+
+def init_database(connection=None):
+    """データベースのスキーマを最新のバージョンに更新
+
+    通常はスキーマバージョンを1回確認するだけで終了し、
+    未適用のマイグレーションがある場合のみDDLを実行する。
+
+    Args:
+        connection: 使用する接続（Noneの場合は新しく接続して終了時に閉じる）
+    """
+    latest_version = MIGRATIONS[-1][0]
+    own_connection = connection is None
     try:
-        connection = get_db_connection()
-        if not connection:
+        if own_connection:
+            connection = get_db_connection()
+            if not connection:
+                return False
+
+        if get_schema_version(connection) >= latest_version:
+            return True
+
+        # 複数のプロセスが同時にマイグレーションを実行しないようにロック
+        if not connection.get_lock(SCHEMA_MIGRATION_LOCK_NAME, SCHEMA_MIGRATION_LOCK_TIMEOUT):
+            print(f'データベース初期化エラー: 他のプロセスのマイグレーションが{SCHEMA_MIGRATION_LOCK_TIMEOUT}秒以内に終わりませんでした')
             return False
-        
+
         cursor = connection.cursor()
-        
-        # テーブル作成
-        # 施設マスタテーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS facilities (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255) NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # 予定テーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS schedule_events (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                facility_id INT NOT NULL,
-                date DATE NOT NULL,
-                title VARCHAR(500) NOT NULL,
-                start_datetime VARCHAR(10) NOT NULL,
-                end_datetime VARCHAR(10) NOT NULL,
-                badge VARCHAR(100),
-                description_url TEXT,
-                EID INT,
-                status TINYINT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_event (facility_id, date, EID),
-                FOREIGN KEY (facility_id) REFERENCES facilities(id) ON DELETE CASCADE,
-                INDEX idx_facility_date (facility_id, date),
-                INDEX idx_date (date),
-                INDEX idx_status (status)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # 参加者テーブル（Laravelマイグレーションを使用する場合は、この関数は使用されません）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS schedule_participants (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                schedule_event_id INT NOT NULL,
-                user_id INT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (schedule_event_id) REFERENCES schedule_events(id) ON DELETE CASCADE,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                UNIQUE KEY unique_participant (schedule_event_id, user_id),
-                INDEX idx_event (schedule_event_id),
-                INDEX idx_user (user_id)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # ユーザー予定テーブル
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_schedules (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT NOT NULL,
-                date DATE NOT NULL,
-                title VARCHAR(500) NOT NULL,
-                start_datetime VARCHAR(10) NOT NULL,
-                end_datetime VARCHAR(10) NOT NULL,
-                badge VARCHAR(100),
-                description_url TEXT,
-                EID INT,
-                status TINYINT DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_user_event (user_id, date, EID),
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-                INDEX idx_user_date (user_id, date),
-                INDEX idx_date (date),
-                INDEX idx_status (status)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # 既存テーブルにEIDカラムを追加し、UNIQUE制約を変更
         try:
-            # schedule_events テーブル
-            cursor.execute("ALTER TABLE schedule_events ADD COLUMN IF NOT EXISTS EID INT")
-        except Error:
-            pass  # カラムが既に存在する場合は無視
-        
-        try:
-            # 古いUNIQUE制約を削除
-            cursor.execute("ALTER TABLE schedule_events DROP INDEX unique_event")
-        except Error:
-            pass  # 制約が既に削除されている場合は無視
-        
-        try:
-            # 新しいUNIQUE制約を追加
-            cursor.execute("ALTER TABLE schedule_events ADD UNIQUE KEY unique_event (facility_id, date, EID)")
-        except Error:
-            pass  # 制約が既に存在する場合は無視
-        
-        try:
-            # user_schedules テーブル
-            cursor.execute("ALTER TABLE user_schedules ADD COLUMN IF NOT EXISTS EID INT")
-        except Error:
-            pass  # カラムが既に存在する場合は無視
-        
-        try:
-            # 古いUNIQUE制約を削除
-            cursor.execute("ALTER TABLE user_schedules DROP INDEX unique_user_event")
-        except Error:
-            pass  # 制約が既に削除されている場合は無視
-        
-        try:
-            # 新しいUNIQUE制約を追加
-            cursor.execute("ALTER TABLE user_schedules ADD UNIQUE KEY unique_user_event (user_id, date, EID)")
-        except Error:
-            pass  # 制約が既に存在する場合は無視
-        
-        # statusカラムを追加（存在しない場合）
-        try:
-            cursor.execute("ALTER TABLE schedule_events ADD COLUMN IF NOT EXISTS status TINYINT DEFAULT 0")
-            cursor.execute("ALTER TABLE schedule_events ADD INDEX IF NOT EXISTS idx_status (status)")
-        except Error:
-            pass  # カラムが既に存在する場合は無視
-        
-        try:
-            cursor.execute("ALTER TABLE user_schedules ADD COLUMN IF NOT EXISTS status TINYINT DEFAULT 0")
-            cursor.execute("ALTER TABLE user_schedules ADD INDEX IF NOT EXISTS idx_status (status)")
-        except Error:
-            pass  # カラムが既に存在する場合は無視
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+                    version INT NOT NULL PRIMARY KEY,
+                    description VARCHAR(255),
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+            """)
+
+            # ロック待ちの間に他のプロセスが適用した分は除く
+            current_version = get_schema_version(connection)
+            for version, description, migrate in MIGRATIONS:
+                if version <= current_version:
+                    continue
+                print(f'マイグレーションを実行中: {version} {description}')
+                migrate(cursor)
+                cursor.execute(
+                    f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                connection.commit()
+        finally:
+            cursor.close()
+            connection.release_lock(SCHEMA_MIGRATION_LOCK_NAME)
+
         return True
     except Error as e:
         print(f'データベース初期化エラー: {e}')
         return False
+    finally:
+        if own_connection and connection:
+            connection.close()
 
 
-def get_facility_id(connection, facility_name):
-    """施設IDを取得（存在しない場合は作成）"""
-    cursor = connection.cursor()
-    
-    # 施設を検索
-    cursor.execute("SELECT id FROM facilities WHERE name = %s", (facility_name,))
-    result = cursor.fetchone()
-    
-    if result:
-        facility_id = result[0]
-    else:
-        # 施設を新規作成
-        cursor.execute("INSERT INTO facilities (name, created_at, updated_at) VALUES (%s, NOW(), NOW())", (facility_name,))
-        connection.commit()
-        facility_id = cursor.lastrowid
-    
-    cursor.close()
-    return facility_id
 
+class UserDirectory:
+    """ユーザー名 → ユーザーIDの索引（実行中はメモリ上で照合する）
+
+    usersテーブルを1回のクエリで読み込み、完全一致 → 正規化した名前の順で照合する。
+    見つからなかった名前は件数を集計する。
+    """
+
+    def __init__(self, connection, max_age=None):
+        """
+        Args:
+            max_age: 索引の有効期間（秒）。経過後の照合時に再読み込みする（Noneの場合は再読み込みしない）
+        """
+        self.connection = connection
+        self.max_age = max_age
+        self.by_name = {}
+        self.by_normalized = {}
+        self.loaded_at = None
+        self.unresolved = {}
+        self.refresh()
+
+    def refresh(self):
+        """usersテーブルから索引を読み込み直す"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, name FROM users")
+        rows = cursor.fetchall()
+        cursor.close()
+
+        by_name = {}
+        by_normalized = {}
+        for user_id, name in rows:
+            if not name:
+                continue
+            by_name.setdefault(name, user_id)
+            key = normalize_user_name(name)
+            # 正規化すると同じになる別ユーザーがいる場合は曖昧なので照合しない
+            if key in by_normalized and by_normalized[key] != user_id:
+                by_normalized[key] = None
+            else:
+                by_normalized[key] = user_id
+
+        self.by_name = by_name
+        self.by_normalized = by_normalized
+        self.loaded_at = datetime.now()
+
+    def resolve(self, name):
+        """ユーザー名からユーザーIDを取得（見つからない場合はNone）"""
+        if self.max_age is not None and (datetime.now() - self.loaded_at).total_seconds() >= self.max_age:
+            self.refresh()
+
+        user_id = self.by_name.get(name)
+        if user_id is None:
+            user_id = self.by_normalized.get(normalize_user_name(name))
+        if user_id is None:
+            self.unresolved[name] = self.unresolved.get(name, 0) + 1
+        return user_id
 
-def get_user_id_by_name(connection, user_name):
-    """ユーザー名からユーザーIDを取得（存在しない場合はNone）"""
+    def unresolved_summary(self):
+        """見つからなかったユーザー名の集計（件数の多い順）"""
+        return sorted(self.unresolved.items(), key=lambda item: (-item[1], item[0]))
+
+
+def refresh_schedule_stats(connection, logger=None):
+    """集計テーブル（schedule_stats）を1トランザクションで作り直す（1ヶ月分の同期時）
+
+    通常の同期ではScheduleWriterが予定の追加・削除と一緒に件数を増減するため、
+    作り直すのは同期以外で登録・削除された予定を反映する1ヶ月分の同期時だけ。
+    作り直す間も、他の接続からはコミット前の集計が見える。
+    予定テーブルの全件を集計するため、READ COMMITTEDで実行して集計元の行をロックしない
+    （REPEATABLE READのINSERT ... SELECTは集計元の全行に共有ロックをかけ、Laravelの書き込みを止める）。
+    """
+    # 分離レベルは次のトランザクションから有効になるため、読み込み中のトランザクションを終えてから設定する
+    end_read_transaction(connection)
     cursor = connection.cursor()
-    
-    # ユーザーを検索（nameカラムで検索）
-    cursor.execute("SELECT id FROM users WHERE name = %s", (user_name,))
-    result = cursor.fetchone()
-    
-    user_id = result[0] if result else None
-    cursor.close()
-    return user_id
+    try:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        rebuild_schedule_stats(cursor)
+        connection.commit()
+        if logger:
+            logger.info('統計の集計テーブルを更新しました')
+        return True
+    except Error as e:
+        connection.rollback()
+        message = f'統計の集計テーブルの更新エラー: {e}'
+        if logger:
+            logger.error(message)
+        else:
+            print(message)
+        return False
+    finally:
+        cursor.close()
 
 
 def load_schedule_from_db(connection):
@@ -303,11 +655,11 @@ def write_log(message, log_file=LOG_FILE):
         print(f'ログ書き込みエラー: {e}')
 
 
-def load_sync_state():
+def load_sync_state(state_file=STATE_FILE):
     """同期状態をJSONファイルから読み込む"""
     try:
-        if os.path.exists(STATE_FILE):
-            with open(STATE_FILE, 'r', encoding='utf-8') as f:
+        if os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
     except Exception as e:
@@ -315,10 +667,10 @@ def load_sync_state():
         return {}
 
 
-def save_sync_state(state):
+def save_sync_state(state, state_file=STATE_FILE):
     """同期状態をJSONファイルに保存"""
     try:
-        with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        with open(state_file, 'w', encoding='utf-8') as f:
             json.dump(state, f, ensure_ascii=False, indent=2)
     except Exception as e:
         print(f'状態ファイル保存エラー: {e}')
@@ -336,8 +688,8 @@ def should_run_full_sync(current_time, state):
     """
     current_hour = current_time.hour
     
-    # 0:00台または12:00台でない場合は実行しない
-    if current_hour != 0 and current_hour != 12:
+    # 0:00台または12:00台（FULL_SYNC_HOURS）でない場合は実行しない
+    if current_hour not in FULL_SYNC_HOURS:
         return False
     
     # 前回の1ヶ月分同期時刻を取得
@@ -427,739 +779,1292 @@ def extract_eid_from_url(url):
         return None
 
 
-def login(driver):
-    # 指定したURLにアクセス
-    url = 'https://9w4c9.cybozu.com/'
-    driver.get(url)
-
-    # username-:0-textというIDが付与されたinputにto-murakamiと入力
-    input_element = driver.find_element(By.ID, 'username-:0-text')
-    input_element.send_keys('to-murakami')
+def build_week_url(search_text, target_date, base_url=CYBOZU_BASE_URL):
+    """施設名・ユーザー名と日付から週表示（ScheduleIndex）のURLを構築
 
-    # password-:1-textというIDが付与されたinput要素にto-murakami@akioka55と入力
-    password_element = driver.find_element(By.ID, 'password-:1-text')
-    password_element.send_keys('to-murakami@akioka55')
+    Args:
+        base_url: 接続先のベースURL（セッションのget_base_urlを渡す）
+    """
+    # 日付を文字列に変換
+    date_str = f"da.{target_date.year}.{target_date.month}.{target_date.day}"
 
-    # login-buttonというクラスが付与された要素をクリック
-    login_button = driver.find_element(By.CLASS_NAME, 'login-button')
-    login_button.click()
+    # 施設名・ユーザー名をURLエンコード
+    encoded_text = quote(search_text)
 
-    time.sleep(1)
-    
-    # c-index-Services-ServiceItemが付与されたクラスの配下にあるa要素をクリック
-    service_item = driver.find_element(By.CLASS_NAME, 'c-index-Services-ServiceItem')
-    link = service_item.find_element(By.TAG_NAME, 'a')
-    link.click()
-    
-    time.sleep(1)
+    return f"{base_url}/o/ag.cgi?page=ScheduleIndex&CP=&uid=796&gid=virtual&date={date_str}&Text={encoded_text}"
 
 
+def collect_event_items(driver, url):
+    """週表示ページからイベント情報を取得
 
-def get_place_schedule(driver, search_term, target_date, connection, logger=None, counters=None, log_messages=None, changed_event_ids=None):
-    """施設のスケジュールを取得
-    
     Args:
-        changed_event_ids: 新規追加・更新されたイベントIDを記録するセット（オプション）
-    """
-    try:
-        # 日付を文字列に変換
-        date_str = f"da.{target_date.year}.{target_date.month}.{target_date.day}"
-        date_key = target_date.strftime('%Y-%m-%d')
-        
-        # 施設名をURLエンコード
-        encoded_text = quote(search_term)
-        
-        # URLを構築
-        url = f"https://9w4c9.cybozu.com/o/ag.cgi?page=ScheduleIndex&CP=&uid=796&gid=virtual&date={date_str}&Text={encoded_text}"
-        
-        message = f'施設「{search_term}」の{date_key}のスケジュールにアクセス中...'
-        if logger:
-            logger.info(message)
-        else:
-            print(message)
-        
-        # URLに直接アクセス
-        driver.get(url)
-        time.sleep(1)
+        driver: WebDriverまたはCybozuHttpSession
 
-        # スケジュール要素を取得
+    Returns:
+        list | None: {href, title, time_text} のリスト（time_textは時刻表示がない場合None）
+    """
+    # HTTPバックエンド: HTMLを直接取得して解析
+    if isinstance(driver, CybozuHttpSession):
         try:
-            element = driver.find_element(By.ID, 'tblgroupweek')
+            items = driver.fetch_week_items(url)
         except Exception as e:
-            print(f'スケジュール要素の取得に失敗しました: {e}')
+            print(f'ページの取得に失敗しました: {e}')
             return None
-        
+        if items is None:
+            print('スケジュール要素の取得に失敗しました: tblgroupweekが見つかりません')
+        return items
+
+    # URLに直接アクセス
+    driver.get(url)
+
+    # スケジュール要素が表示されるまで待機して取得
+    try:
+        element = wait_for_element(driver, 'schedule_table', By.ID, 'tblgroupweek')
+    except Exception as e:
+        print(f'スケジュール要素の取得に失敗しました: {e}')
+        return None
+
+    if SELENIUM_EXTRACT_MODE == 'script':
+        # 1回のexecute_scriptでテーブル内の全イベント情報をJSONとして取得
         try:
-            # eventcellクラスが付与されたすべてのエレメントを取得（週の全日分）
-            eventcells = element.find_elements(By.CLASS_NAME, 'eventcell')
-            
-            # 日付ごとにイベントを格納する辞書
-            events_by_date = {}
-            
-            # 各eventcellからイベントを取得
-            for eventcell in eventcells:
-                # eventInnerクラスが付与された全てのエレメントを取得
-                event_inner_elements = eventcell.find_elements(By.CLASS_NAME, 'eventInner')
-                
-                # 各event_inner_elementからeventDateTimeとeventクラスの要素を取得
-                for event_inner in event_inner_elements:
-                    try:
-                        # 要素を都度取得し直す
-                        event_date_time = event_inner.find_element(By.CLASS_NAME, 'eventDateTime')
-                        event_content = event_inner.find_element(By.CLASS_NAME, 'event')
-
-                        # hrefの値を取得
-                        href = event_content.get_attribute('href')
-                        
-                        # URLから実際の日付を抽出
-                        event_date = extract_date_from_url(href)
-                        if not event_date:
-                            print(f'  警告: URLから日付を抽出できませんでした: {href}')
-                            continue
-                        
-                        # URLからEID（イベントID）を抽出
-                        eid = extract_eid_from_url(href)
-                        
-                        # 時刻を分割して格納
-                        time_parts = event_date_time.text.split('-')
-                        start_datetime = ""
-                        finish_datetime = ""
-                        if len(time_parts) >= 2:
-                            start_datetime = time_parts[0].strip()
-                            finish_datetime = time_parts[1].strip()
-
-                        # タイトルを:で分割
-                        title_parts = event_content.get_attribute('title').split(':')
-                        if len(title_parts) > 1:
-                            badge = title_parts[0].strip()
-                            title = title_parts[1].strip()
-                        else:
-                            badge = ""
-                            title = title_parts[0].strip()
-
-                        # イベントデータを辞書として追加
-                        event_data = {
-                            "title": title,
-                            "start_datetime": start_datetime,
-                            "end_datetime": finish_datetime,
-                            "badge": badge,
-                            "description_url": href,
-                            "eid": eid
-                        }
-                        
-                        # 日付ごとにイベントを格納
-                        if event_date not in events_by_date:
-                            events_by_date[event_date] = []
-                        events_by_date[event_date].append(event_data)
-
-                    except Exception as e:
-                        print(f'  イベント情報の処理中にエラーが発生しました: {e}')
-                        continue
-            
-            # データベースから既存データを読み込む
-            schedule_data = load_schedule_from_db(connection)
-            
-            # 施設IDを取得
-            facility_id = get_facility_id(connection, search_term)
-            cursor = connection.cursor()
-            
-            # 日付ごとにイベントを同期（追加・更新・削除）
-            for event_date, event_list in events_by_date.items():
-                # 既存のイベントを取得（この施設・この日付）
-                cursor.execute("""
-                    SELECT id, title, start_datetime, end_datetime, badge, description_url, EID
-                    FROM schedule_events
-                    WHERE facility_id = %s AND date = %s
-                """, (facility_id, event_date))
-                
-                existing_events = cursor.fetchall()
-                
-                # 既存イベントをDBのidとEIDと内容で索引化
-                existing_events_by_db_id = {}
-                existing_events_by_eid = {}  # EIDで索引化
-                existing_events_by_content = {}  # 日付+時刻+タイトルで照合（EIDなしの場合用）
-                
-                for row in existing_events:
-                    event_info = {
-                        'id': row[0],
-                        'title': row[1],
-                        'start_datetime': row[2],
-                        'end_datetime': row[3],
-                        'badge': row[4],
-                        'description_url': row[5],
-                        'eid': row[6]
-                    }
-                    existing_events_by_db_id[row[0]] = event_info
-                    
-                    # EIDで索引化（EIDがある場合）
-                    if row[6] is not None:
-                        existing_events_by_eid[row[6]] = event_info
-                    
-                    # 内容ベースのキー（EIDなしの場合用）
-                    content_key = f"{row[2]}|{row[3]}|{row[1]}"  # start|end|title
-                    existing_events_by_content[content_key] = event_info
-                
-                # 処理済みのDBイベントIDセット
-                processed_db_ids = set()
-                
-                # 新しいデータを同期（追加・更新）
-                for new_event in event_list:
-                    event_eid = new_event.get('eid')
-                    
-                    # タイトルから[id]を抽出してDB上のイベントIDを取得
-                    db_event_id = extract_id_from_title(new_event['title'])
-                    
-                    existing_event = None
-                    
-                    # まずDB IDで照合（システムから登録されたイベント）
-                    if db_event_id and db_event_id in existing_events_by_db_id:
-                        existing_event = existing_events_by_db_id[db_event_id]
-                        processed_db_ids.add(db_event_id)
-                    # 次にEIDで照合（EIDがある場合）
-                    elif event_eid and event_eid in existing_events_by_eid:
-                        existing_event = existing_events_by_eid[event_eid]
-                        processed_db_ids.add(existing_event['id'])
-                    # 最後に内容で照合（EIDがない場合）
-                    else:
-                        content_key = f"{new_event['start_datetime']}|{new_event['end_datetime']}|{new_event['title']}"
-                        if content_key in existing_events_by_content:
-                            existing_event = existing_events_by_content[content_key]
-                            processed_db_ids.add(existing_event['id'])
-                    
-                    # 既存のイベントを検索
-                    if existing_event:
-                        
-                        # 変更を検知（title, start_datetime, end_datetime, badgeを比較）
-                        has_changes = (
-                            existing_event['title'] != new_event['title'] or
-                            existing_event['start_datetime'] != new_event['start_datetime'] or
-                            existing_event['end_datetime'] != new_event['end_datetime'] or
-                            existing_event['badge'] != new_event['badge']
-                        )
-                        
-                        if has_changes:
-                            # 変更内容の詳細
-                            changes = []
-                            if existing_event['title'] != new_event['title']:
-                                changes.append(f"タイトル: {existing_event['title']} → {new_event['title']}")
-                            if existing_event['start_datetime'] != new_event['start_datetime']:
-                                changes.append(f"開始: {existing_event['start_datetime']} → {new_event['start_datetime']}")
-                            if existing_event['end_datetime'] != new_event['end_datetime']:
-                                changes.append(f"終了: {existing_event['end_datetime']} → {new_event['end_datetime']}")
-                            if existing_event['badge'] != new_event['badge']:
-                                changes.append(f"バッジ: {existing_event['badge']} → {new_event['badge']}")
-                            
-                            # データベースを更新
-                            cursor.execute("""
-                                UPDATE schedule_events
-                                SET title = %s, start_datetime = %s, end_datetime = %s, badge = %s, description_url = %s, EID = %s, updated_at = NOW()
-                                WHERE id = %s
-                            """, (
-                                new_event['title'],
-                                new_event['start_datetime'],
-                                new_event['end_datetime'],
-                                new_event['badge'],
-                                new_event['description_url'],
-                                new_event.get('eid'),
-                                existing_event['id']
-                            ))
-                            connection.commit()
-                            
-                            message = f'[更新] {event_date}: {new_event["title"]} - {", ".join(changes)}'
-                            if logger:
-                                logger.info(message)
-                            else:
-                                print(message)
-                            
-                            # 統計とログに追加
-                            if counters:
-                                counters['facility_update'] += 1
-                            if log_messages is not None:
-                                log_messages.append(f'  [更新] 施設:{search_term} | {event_date} {new_event["start_datetime"]}-{new_event["end_datetime"]} | {new_event["title"]}')
-                            # 変更されたイベントIDを記録
-                            if changed_event_ids is not None:
-                                changed_event_ids.add(existing_event['id'])
-                        else:
-                            # 変更なし
-                            message = f'[変更なし] {event_date}: {new_event["title"]}'
-                            if logger:
-                                logger.debug(message)
-                    else:
-                        # 新規追加
-                        cursor.execute("""
-                            INSERT INTO schedule_events 
-                            (facility_id, date, title, start_datetime, end_datetime, badge, description_url, EID, status, created_at, updated_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, NOW(), NOW())
-                        """, (
-                            facility_id,
-                            event_date,
-                            new_event['title'],
-                            new_event['start_datetime'],
-                            new_event['end_datetime'],
-                            new_event['badge'],
-                            new_event['description_url'],
-                            new_event.get('eid')
-                        ))
-                        connection.commit()
-                        new_event_id = cursor.lastrowid
-                        
-                        message = f'[追加] {event_date}: {new_event["title"]} (ID: {new_event_id}, {new_event["start_datetime"]}-{new_event["end_datetime"]}, {new_event["badge"]})'
-                        if logger:
-                            logger.info(message)
-                        else:
-                            print(message)
-                        
-                        # 統計とログに追加
-                        if counters:
-                            counters['facility_add'] += 1
-                        if log_messages is not None:
-                            log_messages.append(f'  [追加] 施設:{search_term} | {event_date} {new_event["start_datetime"]}-{new_event["end_datetime"]} | {new_event["title"]}')
-                        # 新規追加されたイベントIDを記録
-                        if changed_event_ids is not None:
-                            changed_event_ids.add(new_event_id)
-                
-                # 削除されたイベントを検出して削除
-                for existing_event in existing_events:
-                    event_id = existing_event[0]
-                    event_title = existing_event[1]
-                    event_url = existing_event[5]  # description_url
-                    
-                    # 処理済みでないイベントを削除
-                    if event_id not in processed_db_ids:
-                        # 参加者も削除（CASCADEで自動削除されるが、ログ用）
-                        cursor.execute("DELETE FROM schedule_events WHERE id = %s", (event_id,))
-                        connection.commit()
-                        
-                        message = f'[削除] {event_date}: {event_title} (ID: {event_id}) - Cybozuから削除されました'
-                        if logger:
-                            logger.warning(message)
-                        else:
-                            print(message)
-                        
-                        # 統計とログに追加
-                        if counters:
-                            counters['facility_delete'] += 1
-                        if log_messages is not None:
-                            log_messages.append(f'  [削除] 施設:{search_term} | {event_date} | {event_title}')
-            
-            cursor.close()
-            
-            
+            return json.loads(driver.execute_script(EXTRACT_EVENTS_SCRIPT, element))
         except Exception as e:
             print(f'イベント要素の取得に失敗しました: {e}')
             return None
 
-
+    items = []
+    try:
+        # eventcellクラスが付与されたすべてのエレメントを取得（週の全日分）
+        eventcells = element.find_elements(By.CLASS_NAME, 'eventcell')
+
+        for eventcell in eventcells:
+            # eventInnerクラスが付与された全てのエレメントを取得
+            event_inner_elements = eventcell.find_elements(By.CLASS_NAME, 'eventInner')
+
+            for event_inner in event_inner_elements:
+                try:
+                    event_date_time_elements = event_inner.find_elements(By.CLASS_NAME, 'eventDateTime')
+                    event_content = event_inner.find_element(By.CLASS_NAME, 'event')
+                    items.append({
+                        'href': event_content.get_attribute('href'),
+                        'title': event_content.get_attribute('title'),
+                        'time_text': event_date_time_elements[0].text if event_date_time_elements else None
+                    })
+                except Exception as e:
+                    print(f'  イベント情報の処理中にエラーが発生しました: {e}')
+                    continue
     except Exception as e:
-        print(f'予期せぬエラーが発生しました: {e}')
+        print(f'イベント要素の取得に失敗しました: {e}')
         return None
 
+    return items
 
-def get_user_schedule(driver, user_name, user_id, target_date, connection, logger=None, counters=None, log_messages=None):
-    """ユーザー個人のスケジュールを取得"""
-    try:
-        # 日付を文字列に変換
-        date_str = f"da.{target_date.year}.{target_date.month}.{target_date.day}"
-        date_key = target_date.strftime('%Y-%m-%d')
-        
-        # ユーザー名をURLエンコード
-        encoded_text = quote(user_name)
-        
-        # URLを構築
-        url = f"https://9w4c9.cybozu.com/o/ag.cgi?page=ScheduleIndex&CP=&uid=796&gid=virtual&date={date_str}&Text={encoded_text}"
-        
-        message = f'ユーザー「{user_name}」の{date_key}のスケジュールにアクセス中...'
-        if logger:
-            logger.info(message)
-        else:
-            print(message)
-        
-        # URLに直接アクセス
-        driver.get(url)
-        time.sleep(1)
 
-        # スケジュール要素を取得
+def fetch_participant_names(driver, url):
+    """予定詳細（ScheduleView）ページから参加者名のリストを取得
+
+    Args:
+        driver: WebDriverまたはCybozuHttpSession
+    """
+    # HTTPバックエンド: HTMLを直接取得して解析
+    if isinstance(driver, CybozuHttpSession):
+        return driver.fetch_participant_names(url)
+
+    driver.get(url)
+
+    # ページが完全に読み込まれるまで待機（参加者がいない予定もあるため要素の出現は待たない）
+    wait_for_page_load(driver, 'schedule_view')
+
+    # participantクラスが付与された要素をすべて取得
+    participants_elements = driver.find_elements(By.CLASS_NAME, 'participant')
+    return [element.text for element in participants_elements]
+
+
+def build_events_by_date(items, require_time=False, logger=None):
+    """イベント情報のリストを日付ごとのイベント辞書に変換
+
+    Args:
+        items: collect_event_itemsで取得したイベント情報のリスト
+        require_time: Trueの場合、時刻指定がない予定（終日予定など）を除外する
+
+    Returns:
+        dict: {日付: [イベントデータ, ...]}
+    """
+    events_by_date = {}
+
+    for item in items:
         try:
-            element = driver.find_element(By.ID, 'tblgroupweek')
+            time_text = item['time_text']
+            if time_text is None:
+                if require_time:
+                    # 時刻指定がない予定（終日予定など）はユーザー予定として登録しない
+                    if logger:
+                        logger.debug(f'  時刻指定なしの予定をスキップしました')
+                    continue
+                raise ValueError('eventDateTime要素が見つかりません')
+
+            # hrefの値を取得
+            href = item['href']
+
+            # URLから実際の日付を抽出
+            event_date = extract_date_from_url(href)
+            if not event_date:
+                print(f'  警告: URLから日付を抽出できませんでした: {href}')
+                continue
+
+            # URLからEID（イベントID）を抽出
+            eid = extract_eid_from_url(href)
+
+            # 時刻を分割して格納
+            time_parts = time_text.split('-')
+            start_datetime = ""
+            finish_datetime = ""
+            if len(time_parts) >= 2:
+                start_datetime = time_parts[0].strip()
+                finish_datetime = time_parts[1].strip()
+            elif require_time:
+                # 時刻フォーマットが不正な場合もスキップ
+                if logger:
+                    logger.debug(f'  時刻フォーマット不正の予定をスキップしました: {time_text}')
+                continue
+
+            # タイトルを:で分割
+            title_parts = item['title'].split(':')
+            if len(title_parts) > 1:
+                badge = title_parts[0].strip()
+                title = title_parts[1].strip()
+            else:
+                badge = ""
+                title = title_parts[0].strip()
+
+            # イベントデータを辞書として追加
+            event_data = {
+                "title": title,
+                "start_datetime": start_datetime,
+                "end_datetime": finish_datetime,
+                "badge": badge,
+                "description_url": href,
+                "eid": eid
+            }
+
+            # 日付ごとにイベントを格納
+            if event_date not in events_by_date:
+                events_by_date[event_date] = []
+            events_by_date[event_date].append(event_data)
+
         except Exception as e:
-            print(f'スケジュール要素の取得に失敗しました: {e}')
-            return None
-        
+            print(f'  イベント情報の処理中にエラーが発生しました: {e}')
+            continue
+
+    return events_by_date
+
+
+class SyncWindowPlanner:
+    """施設・ユーザー × 週（同期ウィンドウ）ごとに同期の優先度を決めるスケジューラ
+
+    ウィンドウごとの同期間隔は、今日からの距離（SYNC_WINDOW_INTERVALS）を
+    これまでの変更件数の平均で短くしたもの。前回の同期から間隔以上経過したウィンドウを
+    経過の割合が大きい順に、ページ数の上限まで選ぶ。
+    """
+
+    def __init__(self, state_file=SYNC_WINDOW_STATE_FILE):
+        self.state_file = state_file
+        self.windows = load_sync_state(state_file)
+
+    @staticmethod
+    def key(kind, target_name, week):
+        return f'{kind}|{target_name}|{week}'
+
+    def interval(self, kind, target_name, week):
+        """ウィンドウの同期間隔（分）"""
+        base = SYNC_WINDOW_INTERVALS[min(week, len(SYNC_WINDOW_INTERVALS) - 1)]
+        change_rate = self.windows.get(self.key(kind, target_name, week), {}).get('change_rate', 0.0)
+        return base / (1 + SYNC_WINDOW_CHANGE_WEIGHT * change_rate)
+
+    def priority(self, kind, target_name, week, now):
+        """同期の優先度（前回の同期からの経過時間 / 同期間隔。1以上で同期が必要）"""
+        window = self.windows.get(self.key(kind, target_name, week))
+        if not window or not window.get('last_synced'):
+            return float('inf')
+        last_synced = datetime.strptime(window['last_synced'], '%Y-%m-%d %H:%M:%S')
+        elapsed = (now - last_synced).total_seconds() / 60
+        interval = self.interval(kind, target_name, week)
+        return elapsed / interval if interval > 0 else float('inf')
+
+    def select(self, kind, target_names, weeks_count, now, budget):
+        """同期が必要なウィンドウを優先度の高い順に最大budget件選ぶ
+
+        Returns:
+            list: (施設名・ユーザー名, 週の番号) のリスト
+        """
+        candidates = []
+        for target_name in target_names:
+            for week in range(weeks_count):
+                priority = self.priority(kind, target_name, week, now)
+                if priority >= 1:
+                    candidates.append((priority, week, target_name))
+
+        # 優先度が同じ場合は今日に近い週から
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+        return [(target_name, week) for _, week, target_name in candidates[:budget]]
+
+    def record(self, kind, target_name, week, changes, now):
+        """同期した結果（追加・更新・削除の件数）を記録"""
+        window = self.windows.setdefault(self.key(kind, target_name, week), {'change_rate': 0.0, 'syncs': 0})
+        window['change_rate'] = (1 - SYNC_WINDOW_SMOOTHING) * window['change_rate'] + SYNC_WINDOW_SMOOTHING * changes
+        window['syncs'] += 1
+        window['last_synced'] = now.strftime('%Y-%m-%d %H:%M:%S')
+
+    def save(self):
+        save_sync_state(self.windows, self.state_file)
+
+
+def make_page_hash(events_by_date):
+    """週表示ページのイベント一覧（日付ごと・同期で比較する項目のみ）からハッシュを作成"""
+    normalized = [
+        [event_date, sorted(
+            [event['title'], event['start_datetime'], event['end_datetime'], event['badge'], event['description_url'], event.get('eid')]
+            for event in events_by_date[event_date]
+        )]
+        for event_date in sorted(events_by_date)
+    ]
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    """施設・ユーザー × 週ごとに、前回同期したページのハッシュを保持するキャッシュ
+
+    取得したページのハッシュが前回と同じ場合は、DBとの照合（既存イベントの取得・比較）を省略できる。
+    """
+
+    def __init__(self, state_file=PAGE_CACHE_FILE):
+        self.state_file = state_file
+        self.pages = load_sync_state(state_file)
+
+    @staticmethod
+    def key(kind, owner_id, target_date):
+        return f'{kind}|{owner_id}|{target_date.strftime("%Y-%m-%d")}'
+
+    def is_unchanged(self, key, page_hash):
+        return self.pages.get(key) == page_hash
+
+    def store(self, key, page_hash):
+        self.pages[key] = page_hash
+
+    def clear(self):
+        """すべてのページを次回DBと照合させる（1ヶ月分の同期時）"""
+        self.pages = {}
+
+    def save(self, today):
+        """今日より前の週のハッシュは使わないため削除して保存"""
+        today_key = today.strftime('%Y-%m-%d')
+        self.pages = {key: page_hash for key, page_hash in self.pages.items() if key.rsplit('|', 1)[1] >= today_key}
+        save_sync_state(self.pages, self.state_file)
+
+
+class ScheduleWriter:
+    """予定テーブル（schedule_events / user_schedules）への差分をまとめて反映するライター
+
+    add / update / delete で差分を溜めておき、flush() で一括実行して1回だけコミットする。
+    集計テーブル（schedule_stats）の件数も同じトランザクションで増減する。
+    """
+
+    def __init__(self, connection, kind, owner_id, owner_name):
+        target = TARGET_KINDS[kind]
+        self.connection = connection
+        self.target = target
+        self.table = target['table']
+        self.owner_column = target['owner_column']
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+        self.inserts = []
+        self.updates = []
+        self.deletes = []
+        # (種別, キー, 付随情報) を登録順に保持（ログ出力の順序を保つため）
+        self.actions = []
+
+    def add(self, event_date, new_event, info=None):
+        """新規追加するイベントを登録"""
+        self.inserts.append((
+            self.owner_id,
+            event_date,
+            new_event['title'],
+            new_event['start_datetime'],
+            new_event['end_datetime'],
+            new_event['badge'],
+            new_event['description_url'],
+            new_event.get('eid')
+        ))
+        self.actions.append(('add', len(self.inserts) - 1, info))
+
+    def update(self, event_id, event_date, new_event, info=None):
+        """更新するイベントを登録"""
+        self.updates.append((
+            event_id,
+            new_event['title'],
+            new_event['start_datetime'],
+            new_event['end_datetime'],
+            new_event['badge'],
+            new_event['description_url'],
+            new_event.get('eid')
+        ))
+        self.actions.append(('update', event_id, info))
+
+    def delete(self, event_id, info=None):
+        """削除するイベントを登録"""
+        self.deletes.append(event_id)
+        self.actions.append(('delete', event_id, info))
+
+    @staticmethod
+    def insert_key(event_date, title, start_datetime, end_datetime, eid):
+        """追加した行を読み直すときの照合キー（EIDがある場合は日付+EID、ない場合は日付+時刻+タイトル）"""
+        if eid is not None:
+            return (str(event_date), str(eid))
+        return (str(event_date), start_datetime, end_datetime, title)
+
+    def read_inserted_ids(self, cursor, first_id):
+        """追加した行のIDをトランザクション内で読み直す
+
+        AUTO_INCREMENTのIDは連続して採番されるとは限らない（innodb_autoinc_lock_mode = 2 や
+        auto_increment_increment > 1、Laravelからの同時書き込み）ため、先頭のIDからは求めない。
+
+        Returns:
+            list: self.inserts と同じ順のID（見つからない場合はNone）
+        """
+        cursor.execute(f"""
+            SELECT id, date, title, start_datetime, end_datetime, EID
+            FROM {self.table}
+            WHERE {self.owner_column} = %s AND id >= %s
+            ORDER BY id
+        """, (self.owner_id, first_id))
+        ids_by_key = {}
+        for row in cursor.fetchall():
+            ids_by_key.setdefault(self.insert_key(row[1], row[2], row[3], row[4], row[5]), []).append(row[0])
+
+        ids = []
+        for row in self.inserts:
+            candidates = ids_by_key.get(self.insert_key(row[1], row[2], row[3], row[4], row[7]))
+            ids.append(candidates.pop(0) if candidates else None)
+        return ids
+
+    def count_stats(self, deltas, event_date, badge, delta):
+        """集計テーブルの増減 {(scope, name): 増減} に1件分を加える"""
+        keys = [(self.target['stats_scope'], self.owner_name), ('total', self.target['stats_total'])]
+        if self.target['stats_detail']:
+            keys += [('date', str(event_date)), ('badge', badge or '')]
+        for key in keys:
+            deltas[key] = deltas.get(key, 0) + delta
+
+    def flush(self):
+        """溜めた差分を一括実行してコミット
+
+        Returns:
+            list: (種別, イベントID, 付随情報) を登録順に並べたリスト
+        """
+        if not self.actions:
+            return []
+
+        inserted_ids = []
+        stats_deltas = {}
+        cursor = self.connection.cursor()
         try:
-            # eventcellクラスが付与されたすべてのエレメントを取得（週の全日分）
-            eventcells = element.find_elements(By.CLASS_NAME, 'eventcell')
-            
-            # 日付ごとにイベントを格納する辞書
-            events_by_date = {}
-            
-            # 各eventcellからイベントを取得
-            for eventcell in eventcells:
-                # eventInnerクラスが付与された全てのエレメントを取得
-                event_inner_elements = eventcell.find_elements(By.CLASS_NAME, 'eventInner')
-                
-                # 各event_inner_elementからeventDateTimeとeventクラスの要素を取得
-                for event_inner in event_inner_elements:
-                    try:
-                        # eventDateTimeの存在確認（時刻指定がない予定はスキップ）
-                        event_date_time_elements = event_inner.find_elements(By.CLASS_NAME, 'eventDateTime')
-                        if not event_date_time_elements:
-                            # 時刻指定がない予定（終日予定など）はユーザー予定として登録しない
-                            if logger:
-                                logger.debug(f'  時刻指定なしの予定をスキップしました')
-                            continue
-                        
-                        event_date_time = event_date_time_elements[0]
-                        event_content = event_inner.find_element(By.CLASS_NAME, 'event')
-
-                        # hrefの値を取得
-                        href = event_content.get_attribute('href')
-                        
-                        # URLから実際の日付を抽出
-                        event_date = extract_date_from_url(href)
-                        if not event_date:
-                            print(f'  警告: URLから日付を抽出できませんでした: {href}')
-                            continue
-                        
-                        # URLからEID（イベントID）を抽出
-                        eid = extract_eid_from_url(href)
-                        
-                        # 時刻を分割して格納
-                        time_parts = event_date_time.text.split('-')
-                        start_datetime = ""
-                        finish_datetime = ""
-                        if len(time_parts) >= 2:
-                            start_datetime = time_parts[0].strip()
-                            finish_datetime = time_parts[1].strip()
-                        else:
-                            # 時刻フォーマットが不正な場合もスキップ
-                            if logger:
-                                logger.debug(f'  時刻フォーマット不正の予定をスキップしました: {event_date_time.text}')
-                            continue
-
-                        # タイトルを:で分割
-                        title_parts = event_content.get_attribute('title').split(':')
-                        if len(title_parts) > 1:
-                            badge = title_parts[0].strip()
-                            title = title_parts[1].strip()
-                        else:
-                            badge = ""
-                            title = title_parts[0].strip()
-
-                        # イベントデータを辞書として追加
-                        event_data = {
-                            "title": title,
-                            "start_datetime": start_datetime,
-                            "end_datetime": finish_datetime,
-                            "badge": badge,
-                            "description_url": href,
-                            "eid": eid
-                        }
-                        
-                        # 日付ごとにイベントを格納
-                        if event_date not in events_by_date:
-                            events_by_date[event_date] = []
-                        events_by_date[event_date].append(event_data)
-
-                    except Exception as e:
-                        print(f'  イベント情報の処理中にエラーが発生しました: {e}')
-                        continue
-            
-            cursor = connection.cursor()
-            
-            # 日付ごとにイベントを同期（追加・更新・削除）
-            for event_date, event_list in events_by_date.items():
-                # 既存のイベントを取得（このユーザー・この日付）
-                cursor.execute("""
-                    SELECT id, title, start_datetime, end_datetime, badge, description_url, EID
-                    FROM user_schedules
-                    WHERE user_id = %s AND date = %s
-                """, (user_id, event_date))
-                
-                existing_events = cursor.fetchall()
-                
-                # 既存イベントをDBのidとEIDと内容で索引化
-                existing_events_by_db_id = {}
-                existing_events_by_eid = {}  # EIDで索引化
-                existing_events_by_content = {}  # 日付+時刻+タイトルで照合（EIDなしの場合用）
-                
-                for row in existing_events:
-                    event_info = {
-                        'id': row[0],
-                        'title': row[1],
-                        'start_datetime': row[2],
-                        'end_datetime': row[3],
-                        'badge': row[4],
-                        'description_url': row[5],
-                        'eid': row[6]
-                    }
-                    existing_events_by_db_id[row[0]] = event_info
-                    
-                    # EIDで索引化（EIDがある場合）
-                    if row[6] is not None:
-                        existing_events_by_eid[row[6]] = event_info
-                    
-                    # 内容ベースのキー（EIDなしの場合用）
-                    content_key = f"{row[2]}|{row[3]}|{row[1]}"  # start|end|title
-                    existing_events_by_content[content_key] = event_info
-                
-                # 処理済みのDBイベントIDセット
-                processed_db_ids = set()
-                
-                # 新しいデータを同期（追加・更新）
-                for new_event in event_list:
-                    event_eid = new_event.get('eid')
-                    
-                    # タイトルから[id]を抽出してDB上のイベントIDを取得
-                    db_event_id = extract_id_from_title(new_event['title'])
-                    
-                    existing_event = None
-                    
-                    # まずDB IDで照合（システムから登録されたイベント）
-                    if db_event_id and db_event_id in existing_events_by_db_id:
-                        existing_event = existing_events_by_db_id[db_event_id]
-                        processed_db_ids.add(db_event_id)
-                    # 次にEIDで照合（EIDがある場合）
-                    elif event_eid and event_eid in existing_events_by_eid:
-                        existing_event = existing_events_by_eid[event_eid]
-                        processed_db_ids.add(existing_event['id'])
-                    # 最後に内容で照合（EIDがない場合）
-                    else:
-                        content_key = f"{new_event['start_datetime']}|{new_event['end_datetime']}|{new_event['title']}"
-                        if content_key in existing_events_by_content:
-                            existing_event = existing_events_by_content[content_key]
-                            processed_db_ids.add(existing_event['id'])
-                    
-                    # 既存のイベントを検索
-                    if existing_event:
-                        
-                        # 変更を検知（title, start_datetime, end_datetime, badgeを比較）
-                        has_changes = (
-                            existing_event['title'] != new_event['title'] or
-                            existing_event['start_datetime'] != new_event['start_datetime'] or
-                            existing_event['end_datetime'] != new_event['end_datetime'] or
-                            existing_event['badge'] != new_event['badge']
-                        )
-                        
-                        if has_changes:
-                            # 変更内容の詳細
-                            changes = []
-                            if existing_event['title'] != new_event['title']:
-                                changes.append(f"タイトル: {existing_event['title']} → {new_event['title']}")
-                            if existing_event['start_datetime'] != new_event['start_datetime']:
-                                changes.append(f"開始: {existing_event['start_datetime']} → {new_event['start_datetime']}")
-                            if existing_event['end_datetime'] != new_event['end_datetime']:
-                                changes.append(f"終了: {existing_event['end_datetime']} → {new_event['end_datetime']}")
-                            if existing_event['badge'] != new_event['badge']:
-                                changes.append(f"バッジ: {existing_event['badge']} → {new_event['badge']}")
-                            
-                            # データベースを更新
-                            cursor.execute("""
-                                UPDATE user_schedules
-                                SET title = %s, start_datetime = %s, end_datetime = %s, badge = %s, description_url = %s, EID = %s, updated_at = NOW()
-                                WHERE id = %s
-                            """, (
-                                new_event['title'],
-                                new_event['start_datetime'],
-                                new_event['end_datetime'],
-                                new_event['badge'],
-                                new_event['description_url'],
-                                new_event.get('eid'),
-                                existing_event['id']
-                            ))
-                            connection.commit()
-                            
-                            message = f'[更新] {event_date}: {new_event["title"]} - {", ".join(changes)}'
-                            if logger:
-                                logger.info(message)
-                            else:
-                                print(message)
-                            
-                            # 統計とログに追加
-                            if counters:
-                                counters['user_update'] += 1
-                            if log_messages is not None:
-                                log_messages.append(f'  [更新] ユーザー:{user_name} | {event_date} {new_event["start_datetime"]}-{new_event["end_datetime"]} | {new_event["title"]}')
-                        else:
-                            # 変更なし
-                            message = f'[変更なし] {event_date}: {new_event["title"]}'
-                            if logger:
-                                logger.debug(message)
-                    else:
-                        # 新規追加
-                        cursor.execute("""
-                            INSERT INTO user_schedules 
-                            (user_id, date, title, start_datetime, end_datetime, badge, description_url, EID, status, created_at, updated_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 0, NOW(), NOW())
-                        """, (
-                            user_id,
-                            event_date,
-                            new_event['title'],
-                            new_event['start_datetime'],
-                            new_event['end_datetime'],
-                            new_event['badge'],
-                            new_event['description_url'],
-                            new_event.get('eid')
-                        ))
-                        connection.commit()
-                        new_event_id = cursor.lastrowid
-                        
-                        message = f'[追加] {event_date}: {new_event["title"]} (ID: {new_event_id}, {new_event["start_datetime"]}-{new_event["end_datetime"]}, {new_event["badge"]})'
-                        if logger:
-                            logger.info(message)
-                        else:
-                            print(message)
-                        
-                        # 統計とログに追加
-                        if counters:
-                            counters['user_add'] += 1
-                        if log_messages is not None:
-                            log_messages.append(f'  [追加] ユーザー:{user_name} | {event_date} {new_event["start_datetime"]}-{new_event["end_datetime"]} | {new_event["title"]}')
-                
-                # 削除されたイベントを検出して削除
-                for existing_event in existing_events:
-                    event_id = existing_event[0]
-                    event_title = existing_event[1]
-                    event_url = existing_event[5]  # description_url
-                    
-                    # 処理済みでないイベントを削除
-                    if event_id not in processed_db_ids:
-                        cursor.execute("DELETE FROM user_schedules WHERE id = %s", (event_id,))
-                        connection.commit()
-                        
-                        message = f'[削除] {event_date}: {event_title} (ID: {event_id}) - Cybozuから削除されました'
-                        if logger:
-                            logger.warning(message)
-                        else:
-                            print(message)
-                        
-                        # 統計とログに追加
-                        if counters:
-                            counters['user_delete'] += 1
-                        if log_messages is not None:
-                            log_messages.append(f'  [削除] ユーザー:{user_name} | {event_date} | {event_title}')
-            
+            # 削除（IN句でまとめて削除）。集計用に実際に削除する行の日付・バッジを先に読む
+            for chunk in chunked(self.deletes):
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(f"SELECT date, badge FROM {self.table} WHERE id IN ({placeholders}) FOR UPDATE", tuple(chunk))
+                for event_date, badge in cursor.fetchall():
+                    self.count_stats(stats_deltas, event_date, badge, -1)
+                cursor.execute(f"DELETE FROM {self.table} WHERE id IN ({placeholders})", tuple(chunk))
+
+            # 更新（新しい値の一覧とJOINした1文のUPDATE）
+            # 読み込み後に削除された行（Laravel側での削除など）はJOINで一致しないため、復活しない
+            for chunk in chunked(self.updates):
+                if self.target['stats_detail']:
+                    # バッジが変わる行はバッジごとの件数を付け替える
+                    new_badges = {row[0]: row[4] or '' for row in chunk}
+                    placeholders = ','.join(['%s'] * len(chunk))
+                    cursor.execute(f"""
+                        SELECT id, badge FROM {self.table}
+                        WHERE id IN ({placeholders}) AND {self.owner_column} = %s
+                        FOR UPDATE
+                    """, tuple(new_badges) + (self.owner_id,))
+                    for event_id, badge in cursor.fetchall():
+                        old_key, new_key = ('badge', badge or ''), ('badge', new_badges[event_id])
+                        if old_key != new_key:
+                            stats_deltas[old_key] = stats_deltas.get(old_key, 0) - 1
+                            stats_deltas[new_key] = stats_deltas.get(new_key, 0) + 1
+                first_row = 'SELECT %s AS id, %s AS title, %s AS start_datetime, %s AS end_datetime, %s AS badge, %s AS description_url, %s AS EID'
+                rows = ' UNION ALL '.join([first_row] + ['SELECT %s, %s, %s, %s, %s, %s, %s'] * (len(chunk) - 1))
+                cursor.execute(f"""
+                    UPDATE {self.table} t
+                    JOIN ({rows}) v ON t.id = v.id
+                    SET t.title = v.title,
+                        t.start_datetime = v.start_datetime,
+                        t.end_datetime = v.end_datetime,
+                        t.badge = v.badge,
+                        t.description_url = v.description_url,
+                        t.EID = v.EID,
+                        t.updated_at = NOW()
+                    WHERE t.{self.owner_column} = %s
+                """, tuple(value for row in chunk for value in row) + (self.owner_id,))
+
+            # 新規追加（複数行INSERT）
+            first_ids = []
+            for chunk in chunked(self.inserts):
+                rows = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, 0, NOW(), NOW())'] * len(chunk))
+                cursor.execute(f"""
+                    INSERT INTO {self.table}
+                    ({self.owner_column}, date, title, start_datetime, end_datetime, badge, description_url, EID, status, created_at, updated_at)
+                    VALUES {rows}
+                """, tuple(value for row in chunk for value in row))
+                first_ids.append(cursor.lastrowid)
+            if first_ids:
+                inserted_ids = self.read_inserted_ids(cursor, min(first_ids))
+            for row in self.inserts:
+                self.count_stats(stats_deltas, row[1], row[5], 1)
+
+            apply_schedule_stats(cursor, stats_deltas)
+            self.connection.commit()
+        except Error:
+            self.connection.rollback()
+            raise
+        finally:
             cursor.close()
-            
-        except Exception as e:
-            print(f'イベント要素の取得に失敗しました: {e}')
-            return None
 
-    except Exception as e:
-        print(f'予期せぬエラーが発生しました: {e}')
-        return None
+        results = []
+        for kind, key, info in self.actions:
+            event_id = inserted_ids[key] if kind == 'add' else key
+            if event_id is None:
+                print(f'警告: 追加した予定のIDを取得できませんでした: {self.inserts[key][1]} {self.inserts[key][2]}')
+                continue
+            results.append((kind, event_id, info))
 
+        self.inserts = []
+        self.updates = []
+        self.deletes = []
+        self.actions = []
+        return results
 
-def main():
-    # 開始時刻を記録
-    start_time = datetime.now()
-    
-    # ログの設定
-    logger = setup_logging()
-    logger.info('=' * 60)
-    logger.info('スケジュール同期処理を開始します')
-    logger.info('=' * 60)
-    
-    # ログメッセージを格納するリスト
-    log_messages = []
-    log_messages.append('=' * 80)
-    log_messages.append(f'■ 実行開始: {start_time.strftime("%Y-%m-%d %H:%M:%S")}')
-    
-    # デバッグモード: 処理内容を選択
-    process_facilities = True  # 会議室予定を処理するか
-    process_users = True       # ユーザー予定を処理するか
-    
-    if DEBUG_FLG:
-        print('')
-        print('=' * 60)
-        print('デバッグモード: 処理内容を選択してください')
-        print('=' * 60)
-        print('1. 会議室予定のみ取得・登録')
-        print('2. ユーザー予定のみ取得・登録')
-        print('3. 両方取得・登録')
-        print('=' * 60)
-        
-        while True:
-            choice = input('選択してください (1/2/3): ').strip()
-            if choice == '1':
-                process_facilities = True
-                process_users = False
-                logger.info('デバッグモード: 会議室予定のみを処理します')
-                break
-            elif choice == '2':
-                process_facilities = False
-                process_users = True
-                logger.info('デバッグモード: ユーザー予定のみを処理します')
-                break
-            elif choice == '3':
-                process_facilities = True
-                process_users = True
-                logger.info('デバッグモード: 両方を処理します')
-                break
+
+class ParticipantWriter:
+    """参加者テーブル（schedule_participants）を現在の行との差分で更新するライター
+
+    set_participants でイベントごとの参加者（user_idの集合）を溜めておき、flush() で
+    既存の行と比較して、増えた参加者だけを複数行INSERT、減った参加者だけをDELETEし、
+    1回だけコミットする。参加者に変化がないイベントは行を書き換えない。
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.participants = {}
+        # (イベントID, 付随情報) を登録順に保持（ログ出力の順序を保つため）
+        self.actions = []
+
+    def __len__(self):
+        return len(self.participants)
+
+    def set_participants(self, event_id, user_ids, info=None):
+        """イベントの参加者（user_idのリスト）を登録"""
+        self.participants[event_id] = set(user_ids)
+        self.actions.append((event_id, info))
+
+    def flush(self):
+        """溜めた参加者を既存の行と比較し、差分だけを反映してコミット
+
+        Returns:
+            list: (イベントID, 追加数, 削除数, 付随情報) を登録順に並べたリスト
+        """
+        participants = self.participants
+        actions = self.actions
+        self.participants = {}
+        self.actions = []
+        if not actions:
+            return []
+
+        event_ids = list(participants)
+        current = {event_id: set() for event_id in event_ids}
+        cursor = self.connection.cursor()
+        try:
+            # 現在の参加者をIN句でまとめて取得
+            for chunk in chunked(event_ids):
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(f"""
+                    SELECT schedule_event_id, user_id
+                    FROM schedule_participants
+                    WHERE schedule_event_id IN ({placeholders})
+                """, tuple(chunk))
+                for event_id, user_id in cursor.fetchall():
+                    current[event_id].add(user_id)
+
+            additions = []
+            removals = []
+            for event_id in event_ids:
+                additions.extend((event_id, user_id) for user_id in sorted(participants[event_id] - current[event_id]))
+                removals.extend((event_id, user_id) for user_id in sorted(current[event_id] - participants[event_id]))
+
+            # 減った参加者のみ削除
+            for chunk in chunked(removals):
+                pairs = ', '.join(['(%s, %s)'] * len(chunk))
+                cursor.execute(f"""
+                    DELETE FROM schedule_participants
+                    WHERE (schedule_event_id, user_id) IN ({pairs})
+                """, tuple(value for pair in chunk for value in pair))
+
+            # 増えた参加者のみ追加（複数行INSERT）
+            for chunk in chunked(additions):
+                rows = ', '.join(['(%s, %s, NOW(), NOW())'] * len(chunk))
+                cursor.execute(f"""
+                    INSERT INTO schedule_participants (schedule_event_id, user_id, created_at, updated_at)
+                    VALUES {rows}
+                """, tuple(value for pair in chunk for value in pair))
+
+            self.connection.commit()
+        except Error:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        added_counts = {}
+        removed_counts = {}
+        for event_id, _ in additions:
+            added_counts[event_id] = added_counts.get(event_id, 0) + 1
+        for event_id, _ in removals:
+            removed_counts[event_id] = removed_counts.get(event_id, 0) + 1
+
+        return [
+            (event_id, added_counts.get(event_id, 0), removed_counts.get(event_id, 0), info)
+            for event_id, info in actions
+        ]
+
+
+def chunked(values, size=None):
+    """リストを一括書き込み用に分割"""
+    size = size or WRITE_BATCH_SIZE
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def make_event_fingerprint(event):
+    """イベントの内容（タイトル・日時・バッジ・EID・URL）からフィンガープリントを作成"""
+    _, description_url, title, _, event_date, start_datetime, end_datetime, badge, eid = event
+    values = [title, event_date, start_datetime, end_datetime, badge, eid, description_url]
+    return hashlib.sha1('|'.join(str(value) for value in values).encode('utf-8')).hexdigest()
+
+
+def make_participants_hash(participant_names):
+    """参加者名のリストからハッシュを作成（順序は無視）"""
+    return hashlib.sha1('\n'.join(sorted(participant_names)).encode('utf-8')).hexdigest()
+
+
+def sync_participants(sessions, connection, events, changed_event_ids, full_sync=False, logger=None, log_messages=None, user_directory=None):
+    """予定詳細（ScheduleView）から参加者を取得してschedule_participantsに反映
+
+    前回取得時からイベントの内容が変わっておらず、PARTICIPANT_RECHECK_HOURS以内に
+    確認済みのイベントは取得をスキップする。残りは複数セッションで並列に取得する。
+
+    Args:
+        events: (id, description_url, title, facility_name, date, start, end, badge, EID) のリスト
+        changed_event_ids: 今回の同期で新規追加・更新されたイベントID（必ず取得する）
+        full_sync: Trueの場合、eventsに含まれないイベントの取得状態を削除する
+        user_directory: 使い回すユーザー索引（Noneの場合は取得対象があれば読み込む）
+
+    Returns:
+        int: 登録した参加者数
+    """
+    participant_state = load_sync_state(PARTICIPANT_STATE_FILE)
+    now = datetime.now()
+    recheck_before = now - timedelta(hours=PARTICIPANT_RECHECK_HOURS)
+
+    # 取得が必要なイベントを選別
+    targets = []
+    skipped_count = 0
+    for event in events:
+        fingerprint = make_event_fingerprint(event)
+        previous = participant_state.get(str(event[0]))
+        if (event[0] not in changed_event_ids and previous
+                and previous.get('fingerprint') == fingerprint
+                and previous.get('checked_at', '') >= recheck_before.strftime('%Y-%m-%d %H:%M:%S')):
+            skipped_count += 1
+            continue
+        targets.append((event, fingerprint))
+
+    if logger:
+        logger.info(f'参加者情報: {len(targets)}件を取得します（変更なしのため{skipped_count}件をスキップ）')
+
+    # ユーザー名 → ユーザーIDの索引を1回のクエリで読み込む
+    if user_directory is None and targets:
+        user_directory = UserDirectory(connection)
+
+    participant_count = 0
+    unchanged_count = 0
+    writer = ParticipantWriter(connection)
+
+    def flush_participants():
+        """溜めた参加者の差分を反映し、成功したイベントの取得状態を更新"""
+        nonlocal participant_count
+        try:
+            results = writer.flush()
+        except LockLostError:
+            raise  # 他のプロセスが同期を始めたため、この同期は中止する
+        except Error as e:
+            if logger:
+                logger.error(f'参加者の登録エラー: {e}')
             else:
-                print('無効な選択です。1、2、または3を入力してください。')
-        
-        print('')
-    
+                print(f'参加者の登録エラー: {e}')
+            return
+
+        for event_id, added, removed, info in results:
+            participant_state[str(event_id)] = info['state']
+            participant_count += info['resolved']
+            if not logger:
+                continue
+            if info['not_found_users']:
+                logger.warning(f'  {info["facility_name"]}: {info["title"]} - ユーザーが見つかりません: {", ".join(info["not_found_users"])}')
+            logger.info(
+                f'  {info["facility_name"]}: {info["title"]} - 参加者: {info["resolved"]}名（{info["total"]}名中）'
+                f'（追加{added}名・削除{removed}名）'
+            )
+
+    # 中止した場合（ロックを失ったなど）は、まだ取得していないページを取り消す
+    with closing(run_with_sessions(
+            sessions,
+            targets,
+            lambda session, target: fetch_participant_names(session, target[0][1]),
+            lambda target: target[0][1]
+    )) as pages:
+        for (event, fingerprint), participant_names in pages:
+            event_id, description_url, event_title, facility_name = event[:4]
+            if participant_names is None:
+                if logger:
+                    logger.error(f'  {event_title}: 参加者取得エラー')
+                else:
+                    print(f'  {event_title}: 参加者取得エラー')
+                continue
+
+            checked_at = now.strftime('%Y-%m-%d %H:%M:%S')
+            participants_hash = make_participants_hash(participant_names)
+            previous = participant_state.get(str(event_id))
+
+            # 参加者が前回と同じで、全員のユーザーが見つかっていた場合は更新不要
+            if previous and previous.get('participants') == participants_hash and not previous.get('unresolved'):
+                participant_state[str(event_id)] = dict(previous, fingerprint=fingerprint, checked_at=checked_at)
+                unchanged_count += 1
+                if logger:
+                    logger.debug(f'  {facility_name}: {event_title} - 参加者に変更なし')
+                continue
+
+            # ユーザー名からuser_idを取得
+            user_ids = []
+            not_found_users = []
+            for participant_name in participant_names:
+                user_id = user_directory.resolve(participant_name)
+                if user_id:
+                    user_ids.append(user_id)
+                else:
+                    not_found_users.append(participant_name)
+
+            writer.set_participants(event_id, user_ids, {
+                'facility_name': facility_name,
+                'title': event_title,
+                'resolved': len(set(user_ids)),
+                'total': len(participant_names),
+                'not_found_users': not_found_users,
+                'state': {
+                    'fingerprint': fingerprint,
+                    'participants': participants_hash,
+                    'unresolved': bool(not_found_users),
+                    'checked_at': checked_at
+                }
+            })
+
+            # 一定件数ごとに差分を反映してコミット
+            if len(writer) >= PARTICIPANT_BATCH_SIZE:
+                flush_participants()
+
+    flush_participants()
+
+    if unchanged_count and logger:
+        logger.info(f'参加者情報: {unchanged_count}件は参加者に変更がないため更新をスキップしました')
+
+    # フル同期では対象外になったイベント（過去・削除済み）の取得状態を整理
+    if full_sync:
+        event_ids = {str(event[0]) for event in events}
+        participant_state = {key: value for key, value in participant_state.items() if key in event_ids}
+    save_sync_state(participant_state, PARTICIPANT_STATE_FILE)
+
+    # 見つからなかった参加者の集計
+    if user_directory and user_directory.unresolved:
+        unresolved = user_directory.unresolved_summary()
+        total = sum(count for _, count in unresolved)
+        if logger:
+            logger.warning(f'ユーザーが見つからない参加者: {len(unresolved)}名（延べ{total}件）')
+        if log_messages is not None:
+            log_messages.append(f'■ ユーザーが見つからない参加者: {len(unresolved)}名（延べ{total}件）')
+        for name, count in unresolved:
+            if logger:
+                logger.warning(f'  └ {name}: {count}件')
+            if log_messages is not None:
+                log_messages.append(f'  {name}: {count}件')
+
+    return participant_count
+
+
+def get_week_range(target_date, events_by_date=None):
+    """週表示ページがカバーする期間（開始日から7日間）を取得
+
+    Args:
+        target_date: 週表示の開始日
+        events_by_date: 取得したイベント辞書（範囲外の日付があれば範囲を広げる）
+
+    Returns:
+        tuple: (開始日, 終了日) の 'YYYY-MM-DD' 文字列
+    """
+    week_start = target_date.strftime('%Y-%m-%d')
+    week_end = (target_date + timedelta(days=6)).strftime('%Y-%m-%d')
+    if events_by_date:
+        week_start = min(week_start, min(events_by_date))
+        week_end = max(week_end, max(events_by_date))
+    return week_start, week_end
+
+
+def fetch_week_events(driver, search_text, target_date, require_time=False, logger=None):
+    """週表示ページを取得して日付ごとのイベント辞書を返す
+
+    Returns:
+        dict | None: {日付: [イベントデータ, ...]}。取得に失敗した場合はNone
+    """
+    url = build_week_url(search_text, target_date, get_base_url(driver))
+    items = collect_event_items(driver, url)
+    if items is None:
+        return None
+    return build_events_by_date(items, require_time=require_time, logger=logger)
+
+
+def create_fetch_session(instance=0):
+    """取得用のセッション（WebDriverまたはHTTPクライアント）を作成してログイン
+
+    Args:
+        instance: 並列取得時のセッション番号（ブラウザのユーザーデータを分けるため）
+    """
+    if FETCH_BACKEND == 'http':
+        # HTTPクライアントを使用（ブラウザを起動しない）
+        driver = CybozuHttpSession(CYBOZU_BASE_URL)
+    else:
+        # Chromeブラウザを設定したプロファイルで起動
+        driver = create_driver(BROWSER_PROFILE, 'sync', instance)
+
+    login(driver)
+    return driver
+
+
+def fetch_week_pages(sessions, jobs, require_time=False, logger=None):
+    """複数のログイン済みセッションで週表示ページを並列取得
+
+    取得はワーカースレッドで行い、結果は呼び出し元（単一のDB書き込み側）に返す。
+    ページごとの同期は互いに独立しているため、完了順に処理してよい。
+
+    Args:
+        sessions: ログイン済みのWebDriverまたはCybozuHttpSessionのリスト
+        jobs: (施設名・ユーザー名, 対象日) のリスト
+
+    Yields:
+        tuple: (job, events_by_date)。取得に失敗した場合events_by_dateはNone
+    """
+    def fetch(session, job):
+        search_text, target_date = job
+        if logger:
+            logger.info(f'「{search_text}」の{target_date.strftime("%Y-%m-%d")}の週を取得中...')
+        return fetch_week_events(session, search_text, target_date, require_time, logger)
+
+    return run_with_sessions(sessions, jobs, fetch, lambda job: build_week_url(*job))
+
+
+def run_with_sessions(sessions, jobs, task, url_of):
+    """ログイン済みセッションを貸し出しながらjobsを並列処理
+
+    Args:
+        sessions: ログイン済みのWebDriverまたはCybozuHttpSessionのリスト
+        jobs: 処理対象のリスト
+        task: task(session, job) で結果を返す関数（ワーカースレッドで実行）
+        url_of: jobのアクセス先URLを返す関数（ホストごとの同時リクエスト数の制限に使用）
+
+    Yields:
+        tuple: (job, 結果)。完了した順に返す。例外が発生した場合の結果はNone
+    """
+    # 空いているセッションを貸し出すキュー（1セッションは同時に1ページのみ扱う）
+    idle_sessions = queue.Queue()
+    for session in sessions:
+        idle_sessions.put(session)
+
+    # ホストごとの同時リクエスト数を制限
+    host_semaphores = {}
+    for job in jobs:
+        host = urlparse(url_of(job)).netloc
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+
+    def run(job):
+        host = urlparse(url_of(job)).netloc
+        session = idle_sessions.get()
+        try:
+            with host_semaphores[host]:
+                return task(session, job)
+        finally:
+            idle_sessions.put(session)
+
+    executor = ThreadPoolExecutor(max_workers=len(sessions))
+    try:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f'ページの取得に失敗しました: {e}')
+                result = None
+            yield job, result
+    except GeneratorExit:
+        # 呼び出し側が途中で中止した場合（ロックを失ったなど）は、まだ始まっていない取得を取り消す
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        # 取得中のページは終わるまで待つ（セッションを次の同期で使い回すため）
+        executor.shutdown()
+
+
+def sync_targets(sessions, connection, kind, targets, date_list, logger=None, counters=None, log_messages=None, changed_event_ids=None, planner=None, budget=None, page_cache=None):
+    """施設・ユーザー × 週のページを並列取得し、取得できた順にデータベースへ同期
+
+    Args:
+        kind: 同期対象の種類（'facility' または 'user'）
+        targets: (施設名・ユーザー名, 施設ID・ユーザーID) のリスト
+        date_list: 各週の開始日のリスト
+        planner: SyncWindowPlanner（指定した場合、週ごとの変更件数を記録する）
+        budget: 取得するページ数の上限（指定した場合、plannerで優先度の高い週から選ぶ。Noneの場合は全週）
+        page_cache: PageCache（指定した場合、前回と同じ内容のページはDBとの照合を省略する）
+    """
+    target = TARGET_KINDS[kind]
+    owner_ids = dict(targets)
+    now = datetime.now()
+    if planner and budget is not None:
+        selected = planner.select(kind, list(owner_ids), len(date_list), now, budget)
+        jobs = [(target_name, date_list[week]) for target_name, week in selected]
+        if logger:
+            total = len(owner_ids) * len(date_list)
+            logger.info(f'{target["label"]}: 優先度に基づき{len(jobs)}ページを同期します（全{total}ページ中）')
+    else:
+        jobs = [(target_name, target_date) for target_name, _ in targets for target_date in date_list]
+    week_numbers = {target_date: week for week, target_date in enumerate(date_list)}
+
+    prefix = target['counter_prefix']
+    # 中止した場合（ロックを失ったなど）は、まだ取得していないページを取り消す
+    with closing(fetch_week_pages(sessions, jobs, target['require_time'], logger)) as pages:
+        for i, ((target_name, target_date), events_by_date) in enumerate(pages, 1):
+            owner_id = owner_ids[target_name]
+            if logger:
+                logger.info(f'[{i}/{len(jobs)}] {target["label"]}: {target_name} (ID: {owner_id}) / {target_date.strftime("%Y-%m-%d")} の週を同期中...')
+            if events_by_date is None:
+                continue
+
+            # 前回同期したページと内容が同じ場合はDBとの照合を省略
+            if page_cache:
+                cache_key = page_cache.key(kind, owner_id, target_date)
+                page_hash = make_page_hash(events_by_date)
+                if page_cache.is_unchanged(cache_key, page_hash):
+                    if logger:
+                        logger.debug(f'  前回から変更がないため同期をスキップしました')
+                    if counters:
+                        counters[f'{prefix}_skip'] += 1
+                    if planner:
+                        planner.record(kind, target_name, week_numbers[target_date], 0, now)
+                    continue
+
+            changes_before = sum(counters[f'{prefix}_{action}'] for action in ('add', 'update', 'delete')) if counters else 0
+            synced = sync_week_events(connection, kind, target_name, owner_id, target_date, events_by_date, logger, counters, log_messages, changed_event_ids)
+            # 同期に成功したページのみハッシュ・同期時刻を保存（失敗したページは次回も優先して照合する）
+            if not synced:
+                continue
+            if page_cache:
+                page_cache.store(cache_key, page_hash)
+            if planner:
+                changes_after = sum(counters[f'{prefix}_{action}'] for action in ('add', 'update', 'delete')) if counters else 0
+                planner.record(kind, target_name, week_numbers[target_date], changes_after - changes_before, now)
+
+
+def sync_week_events(connection, kind, target_name, owner_id, target_date, events_by_date, logger=None, counters=None, log_messages=None, changed_event_ids=None):
+    """取得した1週間分のイベントをデータベースに同期（追加・更新・削除）
+
+    施設・ユーザー共通の処理。テーブルや統計キーはTARGET_KINDSの設定に従う。
+    差分はScheduleWriterに溜め、ページ単位で1回だけコミットする。
+
+    Args:
+        kind: 同期対象の種類（'facility' または 'user'）
+        target_name: 施設名・ユーザー名（ログ表示・集計テーブルの名前）
+        owner_id: 施設ID・ユーザーID
+        target_date: 取得した週表示の開始日
+        events_by_date: fetch_week_eventsで取得した日付ごとのイベント辞書
+        changed_event_ids: 新規追加・更新されたイベントIDを記録するセット（オプション）
+
+    Returns:
+        bool | None: 同期に成功した場合True、エラーの場合None
+    """
+    target = TARGET_KINDS[kind]
+    label = target['label']
+    prefix = target['counter_prefix']
+    try:
+        writer = ScheduleWriter(connection, kind, owner_id, target_name)
+
+        # 既存のイベントを週の範囲でまとめて取得し、日付ごとに振り分ける
+        # （施設・週ごとに繰り返し実行するため、プリペアドステートメントで実行）
+        week_start, week_end = get_week_range(target_date, events_by_date)
+        rows = connection.execute_prepared(WEEK_EVENTS_QUERIES[kind], (owner_id, week_start, week_end))
+
+        existing_events_by_date = {}
+        for row in rows:
+            row_date = row[1].strftime('%Y-%m-%d')
+            existing_events_by_date.setdefault(row_date, []).append((row[0],) + tuple(row[2:]))
+
+        # 週の全日付について差分を検出（追加・更新・削除）
+        # Cybozu上で予定がすべて消えた日も、既存イベントを削除するため対象に含める
+        for event_date in sorted(set(events_by_date) | set(existing_events_by_date)):
+            event_list = events_by_date.get(event_date, [])
+            existing_events = existing_events_by_date.get(event_date, [])
+
+            # 既存イベントをDBのidとEIDと内容で索引化
+            existing_events_by_db_id = {}
+            existing_events_by_eid = {}  # EIDで索引化
+            existing_events_by_content = {}  # 日付+時刻+タイトルで照合（EIDなしの場合用）
+
+            for row in existing_events:
+                event_info = {
+                    'id': row[0],
+                    'title': row[1],
+                    'start_datetime': row[2],
+                    'end_datetime': row[3],
+                    'badge': row[4],
+                    'description_url': row[5],
+                    'eid': row[6]
+                }
+                existing_events_by_db_id[row[0]] = event_info
+
+                # EIDで索引化（EIDがある場合）
+                if row[6] is not None:
+                    existing_events_by_eid[row[6]] = event_info
+
+                # 内容ベースのキー（EIDなしの場合用）
+                content_key = f"{row[2]}|{row[3]}|{row[1]}"  # start|end|title
+                existing_events_by_content[content_key] = event_info
+
+            # 処理済みのDBイベントIDセット
+            processed_db_ids = set()
+            # 処理済みのEID（同じ予定がページに2回表示されている場合に、同じ (日付, EID) を
+            # 2回追加してunique_eventの重複でページ全体の書き込みが失敗しないようにする）
+            processed_eids = set()
+
+            # 新しいデータと照合（追加・更新）
+            for new_event in event_list:
+                event_eid = new_event.get('eid')
+                if event_eid is not None:
+                    if event_eid in processed_eids:
+                        if logger:
+                            logger.debug(f'[重複] {event_date}: {new_event["title"]} (EID: {event_eid})')
+                        continue
+                    processed_eids.add(event_eid)
+
+                # タイトルから[id]を抽出してDB上のイベントIDを取得
+                db_event_id = extract_id_from_title(new_event['title'])
+
+                existing_event = None
+
+                # まずDB IDで照合（システムから登録されたイベント）
+                if db_event_id and db_event_id in existing_events_by_db_id:
+                    existing_event = existing_events_by_db_id[db_event_id]
+                    processed_db_ids.add(db_event_id)
+                # 次にEIDで照合（EIDがある場合）
+                elif event_eid and event_eid in existing_events_by_eid:
+                    existing_event = existing_events_by_eid[event_eid]
+                    processed_db_ids.add(existing_event['id'])
+                # 最後に内容で照合（EIDがない場合）
+                else:
+                    content_key = f"{new_event['start_datetime']}|{new_event['end_datetime']}|{new_event['title']}"
+                    if content_key in existing_events_by_content:
+                        existing_event = existing_events_by_content[content_key]
+                        processed_db_ids.add(existing_event['id'])
+
+                # 既存のイベントを検索
+                if existing_event:
+
+                    # 変更を検知（title, start_datetime, end_datetime, badgeを比較）
+                    has_changes = (
+                        existing_event['title'] != new_event['title'] or
+                        existing_event['start_datetime'] != new_event['start_datetime'] or
+                        existing_event['end_datetime'] != new_event['end_datetime'] or
+                        existing_event['badge'] != new_event['badge']
+                    )
+
+                    if has_changes:
+                        # 変更内容の詳細
+                        changes = []
+                        if existing_event['title'] != new_event['title']:
+                            changes.append(f"タイトル: {existing_event['title']} → {new_event['title']}")
+                        if existing_event['start_datetime'] != new_event['start_datetime']:
+                            changes.append(f"開始: {existing_event['start_datetime']} → {new_event['start_datetime']}")
+                        if existing_event['end_datetime'] != new_event['end_datetime']:
+                            changes.append(f"終了: {existing_event['end_datetime']} → {new_event['end_datetime']}")
+                        if existing_event['badge'] != new_event['badge']:
+                            changes.append(f"バッジ: {existing_event['badge']} → {new_event['badge']}")
+
+                        # 更新を登録
+                        writer.update(existing_event['id'], event_date, new_event, (event_date, new_event, changes))
+                    else:
+                        # 変更なし
+                        message = f'[変更なし] {event_date}: {new_event["title"]}'
+                        if logger:
+                            logger.debug(message)
+                else:
+                    # 新規追加を登録
+                    writer.add(event_date, new_event, (event_date, new_event, None))
+
+            # 処理済みでないイベント（Cybozuから削除されたもの）の削除を登録
+            # Cybozuへの登録待ち（status=1）の予約はまだページに表示されないため削除しない
+            for existing_event in existing_events:
+                if existing_event[0] not in processed_db_ids and existing_event[7] != 1:
+                    writer.delete(existing_event[0], (event_date, existing_event[1], None))
+
+        # 差分を一括で反映（このページ分で1回だけコミット）
+        for action, event_id, (event_date, event, changes) in writer.flush():
+            if action == 'update':
+                message = f'[更新] {event_date}: {event["title"]} - {", ".join(changes)}'
+                if logger:
+                    logger.info(message)
+                else:
+                    print(message)
+
+                # 統計とログに追加
+                if counters:
+                    counters[f'{prefix}_update'] += 1
+                if log_messages is not None:
+                    log_messages.append(f'  [更新] {label}:{target_name} | {event_date} {event["start_datetime"]}-{event["end_datetime"]} | {event["title"]}')
+                # 変更されたイベントIDを記録
+                if changed_event_ids is not None:
+                    changed_event_ids.add(event_id)
+            elif action == 'add':
+                message = f'[追加] {event_date}: {event["title"]} (ID: {event_id}, {event["start_datetime"]}-{event["end_datetime"]}, {event["badge"]})'
+                if logger:
+                    logger.info(message)
+                else:
+                    print(message)
+
+                # 統計とログに追加
+                if counters:
+                    counters[f'{prefix}_add'] += 1
+                if log_messages is not None:
+                    log_messages.append(f'  [追加] {label}:{target_name} | {event_date} {event["start_datetime"]}-{event["end_datetime"]} | {event["title"]}')
+                # 新規追加されたイベントIDを記録
+                if changed_event_ids is not None:
+                    changed_event_ids.add(event_id)
+            else:
+                message = f'[削除] {event_date}: {event} (ID: {event_id}) - Cybozuから削除されました'
+                if logger:
+                    logger.warning(message)
+                else:
+                    print(message)
+
+                # 統計とログに追加
+                if counters:
+                    counters[f'{prefix}_delete'] += 1
+                if log_messages is not None:
+                    log_messages.append(f'  [削除] {label}:{target_name} | {event_date} | {event}')
+
+        return True
+
+    except LockLostError:
+        raise  # 他のプロセスが同期を始めたため、この同期は中止する
+    except Exception as e:
+        print(f'データベース同期エラー: {e}')
+        return None
+
+
+def start_sync_runtime(logger):
+    """同期に必要な接続を準備（DB接続・同期のロック・スキーマ確認・施設マスタ・ログイン済みセッション）
+
+    デーモンモードでは起動時に1回だけ準備し、以降の同期で使い回す。
+    同期のロックはブラウザを起動する前に取得し、close_sync_runtimeまで持ち続ける
+    （デーモンの実行中にcronから起動された場合は、同じプロファイルでブラウザを起動せずに終了する）。
+
+    Returns:
+        dict | None: {'connection', 'facility_registry', 'sessions', 'user_directory'}（失敗した場合はNone）
+    """
     # データベース接続
     logger.info('データベースに接続中...')
     connection = get_db_connection()
     if not connection:
         logger.error('データベース接続に失敗しました。処理を終了します。')
-        return
+        return None
     
     logger.info('データベース接続成功')
+
+    # 他のプロセスが同期中の場合は、セッションを作る前に終了
+    if not acquire_sync_lock(connection):
+        logger.warning('他の同期処理が実行中のため、今回の同期をスキップします')
+        connection.close()
+        return None
     
     # データベース初期化
     logger.info('データベースを初期化中...')
-    if not init_database():
+    if not init_database(connection):
         logger.error('データベース初期化に失敗しました。処理を終了します。')
+        release_sync_lock(connection)
         connection.close()
-        return
+        return None
     logger.info('データベース初期化完了')
-    
-    # Chromeブラウザのオプションを設定
-    options = webdriver.ChromeOptions()
-    # options.add_argument('--headless')
 
-    # Chromeブラウザのドライバーを設定
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    # 施設マスタを読み込み、設定した施設一覧をまとめて登録
+    try:
+        facility_registry = FacilityRegistry(connection, FACILITIES)
+    except Error as e:
+        logger.error(f'施設マスタの読み込みに失敗しました: {e}')
+        release_sync_lock(connection)
+        connection.close()
+        return None
+    logger.info(f'施設マスタ: {len(facility_registry.by_name)}施設')
 
-    # ログイン処理
-    logger.info('Cybozuにログイン中...')
-    login(driver)
+    # ログイン処理（並列取得用に複数セッションを用意）
+    logger.info(f'Cybozuにログイン中...（取得方式: {FETCH_BACKEND}、セッション数: {FETCH_WORKERS}）')
+    sessions = [create_fetch_session(i) for i in range(max(1, FETCH_WORKERS))]
     logger.info('ログイン成功')
 
+    return {
+        'connection': connection,
+        'facility_registry': facility_registry,
+        'sessions': sessions,
+        'user_directory': None
+    }
+
+
+def close_sync_runtime(runtime):
+    """同期のロックを解放してDB接続をプールに返し、ブラウザ・HTTPセッションを終了"""
+    release_sync_lock(runtime['connection'])
+    runtime['connection'].close()
+    for session in runtime['sessions']:
+        session.quit()
+
+
+def acquire_sync_lock(connection):
+    """同期のロックを取得（他のプロセスが同期中の場合はFalse。再接続した場合は接続が取り直す）"""
+    return connection.get_lock(SYNC_LOCK_NAME)
+
+
+def release_sync_lock(connection):
+    """同期のロックを解放"""
+    try:
+        connection.release_lock(SYNC_LOCK_NAME)
+    except Error as e:
+        print(f'ロックの解放エラー: {e}')
+
+
+def end_read_transaction(connection):
+    """読み込みだけのトランザクションを終了（REPEATABLE READのスナップショットを解放）
+
+    autocommitが無効のため、書き込みがなかった同期ではSELECTで始まったトランザクションが
+    コミットもロールバックもされずに残り、次回以降の同期でも古いスナップショットを読み続ける
+    （長時間残るとInnoDBのpurgeも止まる）。書き込みは各処理でコミット済みのためロールバックしてよい。
+    """
+    try:
+        connection.rollback()
+    except Error as e:
+        print(f'トランザクションの終了エラー: {e}')
+
+
+def run_sync(runtime, logger, start_time=None, process_facilities=True, process_users=True, full_sync=None):
+    """1回分の同期を実行
+
+    同期のロックはstart_sync_runtimeで取得済み。再接続でロックを失った場合は取り直し、
+    他のプロセスが取得していればスキップする。同期中にロックを失った場合は同期を中止する。
+
+    Args:
+        runtime: start_sync_runtimeで準備した接続
+        full_sync: 1ヶ月分を同期するか（Noneの場合は時刻と前回の実行状態から判定）
+
+    Returns:
+        bool: 同期した場合True（他の同期が実行中のためスキップ・中止した場合False）
+    """
+    start_time = start_time or datetime.now()
+    connection = runtime['connection']
+    if SYNC_LOCK_NAME not in connection.locks and not acquire_sync_lock(connection):
+        logger.warning('他の同期処理が実行中のため、今回の同期をスキップします')
+        return False
+
+    # 待機時間・クエリ時間は同期1回ごとに集計
+    reset_wait_metrics()
+    reset_query_metrics()
+    if runtime['user_directory']:
+        runtime['user_directory'].unresolved = {}
+
+    # 前回の同期・起動時の読み込みのスナップショットを捨て、最新のデータから同期する
+    end_read_transaction(connection)
+    try:
+        sync_once(runtime, logger, start_time, process_facilities, process_users, full_sync)
+    except LockLostError as e:
+        logger.error(f'同期のロックを失ったため、同期を中止しました: {e}')
+        return False
+    finally:
+        end_read_transaction(connection)
+    return True
+
+
+def sync_once(runtime, logger, start_time, process_facilities, process_users, full_sync):
+    """施設予定・参加者・ユーザー予定を同期して、結果をログファイルに書き込む"""
+    connection = runtime['connection']
+    facility_registry = runtime['facility_registry']
+    sessions = runtime['sessions']
+
+    # ログメッセージを格納するリスト
+    log_messages = []
+    log_messages.append('=' * 80)
+    log_messages.append(f'■ 実行開始: {start_time.strftime("%Y-%m-%d %H:%M:%S")}')
+
     # 同期状態を読み込み
     sync_state = load_sync_state()
     
     # 現在時刻に基づいて取得期間を決定
     # 0:00台または12:00台で、前回から1時間以上経過している場合は1ヶ月分
-    # それ以外は1週間分
-    run_full_sync = should_run_full_sync(start_time, sync_state)
+    # それ以外は優先度の高い週（施設・ユーザー × 週ごとの同期間隔で選ぶ）
+    if full_sync is None:
+        run_full_sync = should_run_full_sync(start_time, sync_state)
+    else:
+        run_full_sync = full_sync
     
     if run_full_sync:
-        weeks_count = 5  # 5週間分（約1ヶ月）
         date_range_text = '1ヶ月分（5週間）'
         logger.info(f'>>> 定期実行時刻（{start_time.hour}:00台）のため、1ヶ月分のデータを取得します。')
         # 実行時刻を記録
         sync_state['last_full_sync'] = start_time.strftime('%Y-%m-%d %H:%M:%S')
         save_sync_state(sync_state)
     else:
-        weeks_count = 1  # 1週間分
-        date_range_text = '1週間分'
+        date_range_text = '優先度の高い週（5週間から選択）'
         current_hour = start_time.hour
-        if current_hour == 0 or current_hour == 12:
+        if current_hour in FULL_SYNC_HOURS:
             last_full = sync_state.get('last_full_sync', '未実行')
-            logger.info(f'>>> 定期実行時刻ですが、前回実行済み（{last_full}）のため、1週間分のデータを取得します。')
+            logger.info(f'>>> 定期実行時刻ですが、前回実行済み（{last_full}）のため、優先度の高い週のデータを取得します。')
         else:
-            logger.info(f'>>> 通常実行のため、1週間分のデータを取得します。')
+            logger.info(f'>>> 通常実行のため、優先度の高い週のデータを取得します。')
     
     log_messages.append(f'■ 取得期間: {date_range_text}')
     
     # 現在の日付から週のリストを生成（7日おき）
     # Cybozuは週表示なので、7日おきにアクセスすれば全期間をカバーできる
     start_date = start_time
-    date_list = [start_date + timedelta(days=x*7) for x in range(weeks_count)]
+    date_list = [start_date + timedelta(days=x*7) for x in range(SYNC_WEEKS)]
+
+    # 施設・ユーザー × 週ごとの同期の優先度（通常同期では優先度の高い週だけを取得）
+    planner = SyncWindowPlanner()
+
+    # 前回同期したページのハッシュ（1ヶ月分の同期では使わず、すべてのページをDBと照合する）
+    page_cache = PageCache()
+    if run_full_sync:
+        page_cache.clear()
     
     participant_count = 0
     
@@ -1170,7 +2075,9 @@ def main():
         'facility_delete': 0,
         'user_add': 0,
         'user_update': 0,
-        'user_delete': 0
+        'user_delete': 0,
+        'facility_skip': 0,
+        'user_skip': 0
     }
     
     # 新規追加・更新されたイベントIDを記録するセット
@@ -1179,21 +2086,17 @@ def main():
     # === 会議室予定の取得 ===
     if process_facilities:
         # 施設のスケジュールを取得
-        searchArray = ['社長室', '応接室', '事務室面談テーブル', '社員休憩室', '二階食堂']
+        searchArray = SYNC_FACILITIES
         
         logger.info(f'取得期間: {date_list[0].strftime("%Y-%m-%d")} ~ 約1ヶ月先まで ({len(date_list)}週間)')
         logger.info(f'対象施設: {", ".join(searchArray)} ({len(searchArray)}施設)')
         logger.info('週表示のため、7日おきにアクセスします')
         logger.info('')
 
-        # 各施設・各週でスケジュールを取得
-        for search_term in searchArray:
-            logger.info(f'{"=" * 40}')
-            logger.info(f'施設: {search_term}')
-            logger.info(f'{"=" * 40}')
-            for i, target_date in enumerate(date_list, 1):
-                logger.info(f'週 {i}/{len(date_list)}: {target_date.strftime("%Y-%m-%d")} の週を取得中...')
-                get_place_schedule(driver, search_term, target_date, connection, logger, counters, log_messages, changed_event_ids)
+        # 各施設・各週のページを並列取得し、取得できた順にデータベースへ同期
+        facilities = [(search_term, facility_registry.resolve(search_term)) for search_term in searchArray]
+        budget = None if run_full_sync else len(facilities) * SYNC_WINDOW_PAGES_PER_TARGET
+        sync_targets(sessions, connection, 'facility', facilities, date_list, logger, counters, log_messages, changed_event_ids, planner, budget, page_cache)
 
         # 施設スケジュール参加ユーザーを取得
         logger.info('')
@@ -1202,18 +2105,20 @@ def main():
         logger.info('=' * 60)
         
         cursor = connection.cursor()
-        
-        # フル同期の場合は全イベント、通常同期の場合は新規・更新されたイベントのみ
+
+        # フル同期の場合は今日以降の全イベント、通常同期の場合は新規・更新されたイベントのみ
         events = []
-        
+
         if run_full_sync:
-            logger.info('フル同期: 全イベントの参加者情報を取得します')
-            # データベースから全イベントを取得
+            logger.info('フル同期: 今日以降の全イベントの参加者情報を確認します')
+            # データベースから今日以降の全イベントを取得（過去の予定は参加者を取り直さない）
             cursor.execute("""
-                SELECT se.id, se.description_url, se.title, f.name as facility_name
+                SELECT se.id, se.description_url, se.title, f.name as facility_name,
+                       se.date, se.start_datetime, se.end_datetime, se.badge, se.EID
                 FROM schedule_events se
                 JOIN facilities f ON se.facility_id = f.id
                 WHERE se.description_url IS NOT NULL AND se.description_url != ''
+                  AND se.date >= CURDATE()
                 ORDER BY f.name, se.date
             """)
             events = cursor.fetchall()
@@ -1222,7 +2127,8 @@ def main():
             # 新規・更新されたイベントのみ取得
             placeholders = ','.join(['%s'] * len(changed_event_ids))
             cursor.execute(f"""
-                SELECT se.id, se.description_url, se.title, f.name as facility_name
+                SELECT se.id, se.description_url, se.title, f.name as facility_name,
+                       se.date, se.start_datetime, se.end_datetime, se.badge, se.EID
                 FROM schedule_events se
                 JOIN facilities f ON se.facility_id = f.id
                 WHERE se.id IN ({placeholders})
@@ -1232,49 +2138,13 @@ def main():
             events = cursor.fetchall()
         else:
             logger.info('通常同期: 新規・更新されたイベントがないため、参加者情報の取得をスキップします')
-        
-        for event_id, description_url, event_title, facility_name in events:
-            try:
-                driver.get(description_url)
-                time.sleep(1)  # ページが完全に読み込まれるまで待機
-
-                # participantクラスが付与された要素をすべて取得
-                participants_elements = driver.find_elements(By.CLASS_NAME, 'participant')
-                participant_names = [element.text for element in participants_elements]
-
-                # 既存の参加者を削除
-                cursor.execute("DELETE FROM schedule_participants WHERE schedule_event_id = %s", (event_id,))
-                
-                # 新しい参加者を追加（ユーザー名からuser_idを取得）
-                added_count = 0
-                not_found_users = []
-                for participant_name in participant_names:
-                    user_id = get_user_id_by_name(connection, participant_name)
-                    if user_id:
-                        try:
-                            cursor.execute("""
-                                INSERT INTO schedule_participants (schedule_event_id, user_id, created_at, updated_at)
-                                VALUES (%s, %s, NOW(), NOW())
-                            """, (event_id, user_id))
-                            added_count += 1
-                        except Error as e:
-                            # 重複エラーなどは無視
-                            logger.debug(f'  参加者追加エラー: {participant_name} - {e}')
-                    else:
-                        not_found_users.append(participant_name)
-                
-                connection.commit()
-                participant_count += added_count
-                
-                if not_found_users:
-                    logger.warning(f'  {facility_name}: {event_title} - ユーザーが見つかりません: {", ".join(not_found_users)}')
-                
-                logger.info(f'  {facility_name}: {event_title} - 参加者: {added_count}名（{len(participant_names)}名中）')
-            except Exception as e:
-                logger.error(f'  {event_title}: 参加者取得エラー - {e}')
-                connection.rollback()
-        
+
         cursor.close()
+
+        # 参加者を並列取得（内容が変わっていないイベントはスキップ）
+        participant_count += sync_participants(
+            sessions, connection, events, changed_event_ids, run_full_sync, logger, log_messages, runtime['user_directory']
+        )
     else:
         logger.info('会議室予定の取得をスキップします')
         logger.info('')
@@ -1304,26 +2174,24 @@ def main():
             logger.info(f'取得期間: {date_list[0].strftime("%Y-%m-%d")} ~ 約1ヶ月先まで ({len(date_list)}週間)')
             logger.info('')
             
-            # 各ユーザー・各週でスケジュールを取得
-            for user in cybozu_users:
-                user_id = user['id']
-                user_name = user['name']
-                
-                logger.info(f'{"=" * 40}')
-                logger.info(f'ユーザー: {user_name} (ID: {user_id})')
-                logger.info(f'{"=" * 40}')
-                
-                for i, target_date in enumerate(date_list, 1):
-                    logger.info(f'週 {i}/{len(date_list)}: {target_date.strftime("%Y-%m-%d")} の週を取得中...')
-                    get_user_schedule(driver, user_name, user_id, target_date, connection, logger, counters, log_messages)
+            # 各ユーザー・各週のページを並列取得し、取得できた順にデータベースへ同期
+            users = [(user['name'], user['id']) for user in cybozu_users]
+            budget = None if run_full_sync else len(users) * SYNC_WINDOW_PAGES_PER_TARGET
+            sync_targets(sessions, connection, 'user', users, date_list, logger, counters, log_messages, planner=planner, budget=budget, page_cache=page_cache)
         else:
             logger.info('cybozu_flg=1のユーザーが見つかりませんでした')
     else:
         logger.info('ユーザー個人予定の取得をスキップします')
         logger.info('')
-    
-    connection.close()
-    driver.quit()
+
+    # 週ごとの同期時刻・変更件数とページのハッシュを保存
+    planner.save()
+    page_cache.save(start_date)
+
+    # 統計の集計テーブルは予定の書き込みと一緒に増減済み。1ヶ月分の同期時だけ作り直し、
+    # Laravel側など同期以外で登録・削除された予定も反映する
+    if run_full_sync:
+        refresh_schedule_stats(connection, logger)
     
     # 終了時刻を記録
     end_time = datetime.now()
@@ -1344,12 +2212,14 @@ def main():
         logger.info(f'  └ 追加: {counters["facility_add"]}件')
         logger.info(f'  └ 更新: {counters["facility_update"]}件')
         logger.info(f'  └ 削除: {counters["facility_delete"]}件')
+        logger.info(f'  └ 変更なし（照合を省略）: {counters["facility_skip"]}ページ')
         logger.info(f'  └ 参加者情報: {participant_count}名を取得')
         
         log_messages.append(f'  [会議室予定]')
         log_messages.append(f'    追加: {counters["facility_add"]}件')
         log_messages.append(f'    更新: {counters["facility_update"]}件')
         log_messages.append(f'    削除: {counters["facility_delete"]}件')
+        log_messages.append(f'    変更なし（照合を省略）: {counters["facility_skip"]}ページ')
         log_messages.append(f'    参加者: {participant_count}名')
     else:
         logger.info('会議室予定: スキップ')
@@ -1360,15 +2230,37 @@ def main():
         logger.info(f'  └ 追加: {counters["user_add"]}件')
         logger.info(f'  └ 更新: {counters["user_update"]}件')
         logger.info(f'  └ 削除: {counters["user_delete"]}件')
+        logger.info(f'  └ 変更なし（照合を省略）: {counters["user_skip"]}ページ')
         
         log_messages.append(f'  [ユーザー個人予定] {len(cybozu_users) if cybozu_users else 0}名')
         log_messages.append(f'    追加: {counters["user_add"]}件')
         log_messages.append(f'    更新: {counters["user_update"]}件')
         log_messages.append(f'    削除: {counters["user_delete"]}件')
+        log_messages.append(f'    変更なし（照合を省略）: {counters["user_skip"]}ページ')
     else:
         logger.info('ユーザー個人予定: スキップ')
         log_messages.append('  [ユーザー個人予定] スキップ')
     
+    # 待機時間の集計
+    wait_summary = format_wait_metrics()
+    if wait_summary:
+        logger.info('待機時間:')
+        log_messages.append('')
+        log_messages.append('■ 待機時間')
+        for line in wait_summary:
+            logger.info(f'  └ {line}')
+            log_messages.append(f'  {line}')
+
+    # クエリの実行時間の集計
+    query_summary = format_query_metrics()
+    if query_summary:
+        logger.info('クエリ時間:')
+        log_messages.append('')
+        log_messages.append('■ クエリ時間')
+        for line in query_summary:
+            logger.info(f'  └ {line}')
+            log_messages.append(f'  {line}')
+
     log_messages.append('')
     log_messages.append(f'■ 実行終了: {end_time.strftime("%Y-%m-%d %H:%M:%S")}')
     log_messages.append(f'■ 処理時間: {processing_time:.2f}秒')
@@ -1380,5 +2272,148 @@ def main():
     logger.info(f'ログを {LOG_FILE} に保存しました。')
     logger.info('=' * 60)
 
+
+def get_next_run_time(now):
+    """次の同期の実行時刻を求める
+
+    通常の間隔（DAEMON_INTERVAL_MINUTES）と次の1ヶ月分の同期時刻（FULL_SYNC_HOURS）の
+    早い方に、最大DAEMON_JITTER_SECONDS秒のジッターを加える。
+    """
+    next_run = now + timedelta(minutes=DAEMON_INTERVAL_MINUTES)
+    for hour in FULL_SYNC_HOURS:
+        full_sync_time = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if full_sync_time <= now:
+            full_sync_time += timedelta(days=1)
+        next_run = min(next_run, full_sync_time)
+    return next_run + timedelta(seconds=random.uniform(0, DAEMON_JITTER_SECONDS))
+
+
+def refresh_sessions(runtime, logger):
+    """ログインが切れたセッションはログインし直し、応答しないセッションは作り直す"""
+    sessions = runtime['sessions']
+    for index, session in enumerate(sessions):
+        try:
+            if not is_logged_in(session):
+                logger.info(f'セッション{index}: ログインし直します')
+                login(session)
+        except Exception as e:
+            logger.warning(f'セッション{index}を作り直します: {e}')
+            try:
+                session.quit()
+            except Exception:
+                pass  # 応答しないブラウザは終了できなくても続行
+            sessions[index] = create_fetch_session(index)
+
+
+def run_daemon(logger):
+    """デーモンモード: 接続を維持したまま、スケジューラで同期を繰り返す
+
+    DAEMON_INTERVAL_MINUTESごとに同期し、FULL_SYNC_HOURSの時刻には1ヶ月分を同期する
+    （1ヶ月分か優先度の高い週だけかは should_run_full_sync で判定）。
+    SIGINT / SIGTERM を受け取ると、実行中の同期が終わってから終了する。
+    起動時にcronの同期がロックを持っている場合（DB接続の失敗なども）は、終了せずに待って準備し直す。
+    """
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info('終了要求を受け付けました。実行中の同期が終わり次第終了します。')
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    runtime = start_sync_runtime(logger)
+    while not runtime:
+        logger.info(f'{DAEMON_START_RETRY_SECONDS}秒後に起動し直します')
+        if stop_event.wait(DAEMON_START_RETRY_SECONDS):
+            logger.info('デーモンを終了しました')
+            return
+        runtime = start_sync_runtime(logger)
+
+    # ユーザー索引は同期をまたいで使い回し、一定時間ごとに読み込み直す
+    runtime['user_directory'] = UserDirectory(runtime['connection'], max_age=USER_DIRECTORY_MAX_AGE)
+
+    logger.info(f'デーモンモードで起動しました（通常同期: {DAEMON_INTERVAL_MINUTES}分ごと、1ヶ月分の同期: {", ".join(f"{hour}:00" for hour in FULL_SYNC_HOURS)}）')
+    try:
+        while not stop_event.is_set():
+            try:
+                refresh_sessions(runtime, logger)
+                run_sync(runtime, logger)
+            except Exception as e:
+                logger.error(f'同期処理でエラーが発生しました: {e}')
+
+            next_run = get_next_run_time(datetime.now())
+            logger.info(f'次回の同期: {next_run.strftime("%Y-%m-%d %H:%M:%S")}')
+            stop_event.wait(max(0, (next_run - datetime.now()).total_seconds()))
+    finally:
+        close_sync_runtime(runtime)
+        logger.info('デーモンを終了しました')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cybozuのスケジュールをデータベースに同期')
+    parser.add_argument('--daemon', action='store_true', help='常駐して定期的に同期する（デーモンモード）')
+    args = parser.parse_args()
+
+    # 開始時刻を記録
+    start_time = datetime.now()
+    
+    # ログの設定
+    logger = setup_logging()
+    logger.info('=' * 60)
+    logger.info('スケジュール同期処理を開始します')
+    logger.info('=' * 60)
+
+    # デーモンモード: 接続を維持したまま定期的に同期
+    if args.daemon:
+        run_daemon(logger)
+        return
+    
+    # デバッグモード: 処理内容を選択
+    process_facilities = True  # 会議室予定を処理するか
+    process_users = True       # ユーザー予定を処理するか
+    
+    if DEBUG_FLG:
+        print('')
+        print('=' * 60)
+        print('デバッグモード: 処理内容を選択してください')
+        print('=' * 60)
+        print('1. 会議室予定のみ取得・登録')
+        print('2. ユーザー予定のみ取得・登録')
+        print('3. 両方取得・登録')
+        print('=' * 60)
+        
+        while True:
+            choice = input('選択してください (1/2/3): ').strip()
+            if choice == '1':
+                process_facilities = True
+                process_users = False
+                logger.info('デバッグモード: 会議室予定のみを処理します')
+                break
+            elif choice == '2':
+                process_facilities = False
+                process_users = True
+                logger.info('デバッグモード: ユーザー予定のみを処理します')
+                break
+            elif choice == '3':
+                process_facilities = True
+                process_users = True
+                logger.info('デバッグモード: 両方を処理します')
+                break
+            else:
+                print('無効な選択です。1、2、または3を入力してください。')
+        
+        print('')
+
+    # 接続を準備して1回だけ同期
+    runtime = start_sync_runtime(logger)
+    if not runtime:
+        return
+
+    try:
+        run_sync(runtime, logger, start_time, process_facilities, process_users)
+    finally:
+        close_sync_runtime(runtime)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,14 @@
+"""ユーザー名の照合
+
+Cybozuの表示名とusersテーブルの名前を照合するための正規化。main.py と insert.py で共通に使う。
+"""
+import unicodedata
+
+
+def normalize_user_name(name):
+    """ユーザー名を照合用に正規化
+
+    全角・半角の違いと空白（全角スペース・半角スペース）を無視する。
+    例: "中原　清忠" / "中原 清忠" / "中原清忠" -> "中原清忠"
+    """
+    return ''.join(unicodedata.normalize('NFKC', name).split())
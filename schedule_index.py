@@ -0,0 +1,131 @@
+"""スケジュール検索用のインデックス
+
+ScheduleSnapshotごとに1回だけ作成し、/api/search では全件を走査せずに
+施設・日付・キーワード・参加者の絞り込み結果（予定の番号の集合）を掛け合わせて検索する。
+予定は (日付, 開始時刻) の順に並べておき、番号順に返せばソート済みになる。
+"""
+
+
+def make_ngrams(text):
+    """文字列の1文字・2文字のn-gramの集合（日本語は単語に区切れないため文字単位で索引化）"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class NgramIndex:
+    """文字n-gramの転置インデックス {n-gram: {項目, ...}}"""
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, text, item):
+        for gram in make_ngrams(text):
+            self.postings.setdefault(gram, set()).add(item)
+
+    def candidates(self, query):
+        """queryを含む可能性がある項目の集合（部分一致の確認は呼び出し側で行う）"""
+        if len(query) == 1:
+            return set(self.postings.get(query, ()))
+
+        grams = sorted((query[i:i + 2] for i in range(len(query) - 1)), key=lambda gram: len(self.postings.get(gram, ())))
+        result = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not result:
+                break
+            result &= self.postings.get(gram, set())
+        return result
+
+
+class ScheduleIndex:
+    """スナップショットの予定を検索するためのインデックス
+
+    Attributes:
+        rows: 検索結果の形式の予定のタプル（日付・開始時刻の順）
+    """
+
+    def __init__(self, data):
+        rows = []
+        for place_name, dates_dict in data.items():
+            for date_key, events in dates_dict.items():
+                for event in events:
+                    rows.append({
+                        'facility': place_name,
+                        'date': date_key,
+                        'title': event.get('title') or '',
+                        'start_time': event.get('start_datetime') or '',
+                        'end_time': event.get('end_datetime') or '',
+                        'badge': event.get('badge') or '',
+                        'participants': list(event['participants']),
+                        'url': event.get('description_url', ''),
+                        'id': event.get('id', '')
+                    })
+
+        # 日付と開始時刻でソート（以降は番号順に並べればソート済みになる）
+        rows.sort(key=lambda x: (x['date'], x['start_time']))
+        self.rows = tuple(rows)
+
+        self.by_facility = {}
+        self.by_date = {}
+        self.texts = []
+        self.text_index = NgramIndex()
+        self.by_participant = {}
+        self.participant_index = NgramIndex()
+
+        for position, row in enumerate(self.rows):
+            self.by_facility.setdefault(row['facility'], set()).add(position)
+            self.by_date.setdefault(row['date'], set()).add(position)
+
+            # キーワードはタイトル・バッジのどちらかに含まれれば一致（小文字で比較）
+            title = row['title'].lower()
+            badge = row['badge'].lower()
+            self.texts.append((title, badge))
+            self.text_index.add(title, position)
+            self.text_index.add(badge, position)
+
+            for name in row['participants']:
+                name_lower = name.lower()
+                if name_lower not in self.by_participant:
+                    self.by_participant[name_lower] = set()
+                    self.participant_index.add(name_lower, name_lower)
+                self.by_participant[name_lower].add(position)
+
+    def match_keyword(self, keyword):
+        keyword_lower = keyword.lower()
+        return {
+            position for position in self.text_index.candidates(keyword_lower)
+            if keyword_lower in self.texts[position][0] or keyword_lower in self.texts[position][1]
+        }
+
+    def match_participant(self, participant):
+        participant_lower = participant.lower()
+        positions = set()
+        for name in self.participant_index.candidates(participant_lower):
+            if participant_lower in name:
+                positions |= self.by_participant[name]
+        return positions
+
+    def search(self, facility=None, date=None, keyword=None, participant=None):
+        """条件に一致する予定のリスト（日付・開始時刻の順）"""
+        matches = []
+        if facility:
+            matches.append(self.by_facility.get(facility, set()))
+        if date:
+            matches.append(self.by_date.get(date, set()))
+        if keyword:
+            matches.append(self.match_keyword(keyword))
+        if participant:
+            matches.append(self.match_participant(participant))
+
+        if not matches:
+            positions = range(len(self.rows))
+        else:
+            # 件数の少ない条件から掛け合わせる
+            matches.sort(key=len)
+            result = set(matches[0])
+            for match in matches[1:]:
+                result &= match
+            positions = sorted(result)
+
+        # 呼び出し元で変更されてもインデックスに影響しないようにコピーして返す
+        return [dict(self.rows[position], participants=list(self.rows[position]['participants'])) for position in positions]
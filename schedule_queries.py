@@ -0,0 +1,263 @@
+"""Webアプリ用のスケジュール検索（MySQLから直接取得）
+
+main.py が同期している schedule_events / schedule_participants を app.py から検索する。
+施設・日付・キーワード・参加者の絞り込みはSQLで行い（idx_facility_date / idx_date を使用）、
+結果はページ単位で返す。同じ条件の結果は QUERY_CACHE_TTL 秒だけキャッシュする。
+統計は main.py が同期のたびに更新する集計テーブル（schedule_stats）から読む。
+"""
+import threading
+import time
+from mysql.connector import Error
+from db import get_db_connection, POOL_SIZE
+
+
+# 検索結果をキャッシュする時間（秒）
+QUERY_CACHE_TTL = 30
+
+# キャッシュする検索条件の数の上限
+QUERY_CACHE_SIZE = 256
+
+# 検索結果の1ページあたりの件数（既定値・上限）
+SEARCH_PAGE_SIZE = 200
+SEARCH_MAX_PAGE_SIZE = 1000
+
+# 同時にDBへ問い合わせるリクエスト数（接続プールのサイズを超えないようにする）
+_connection_slots = threading.BoundedSemaphore(POOL_SIZE)
+
+
+def like_pattern(text):
+    """部分一致検索用のLIKEパターン（%・_はエスケープする）"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class TTLCache:
+    """結果を一定時間だけ保持するキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """キャッシュがあれば返し、なければloader()の結果を保存して返す（例外の場合は保存しない）"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        value = loader()
+
+        with self._lock:
+            self.entries[key] = (now + self.ttl, value)
+            if len(self.entries) > self.max_entries:
+                # 期限切れを削除し、それでも多い場合は古いものから削除
+                self.entries = {k: e for k, e in self.entries.items() if e[0] > now}
+                while len(self.entries) > self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+
+
+class ScheduleQueries:
+    """施設予定（schedule_events）の検索
+
+    結果はキャッシュと共有するため、呼び出し側で変更しないこと。
+    DBエラーの場合は空の結果を返す（キャッシュはしない）。
+    """
+
+    def __init__(self, ttl=QUERY_CACHE_TTL):
+        self.cache = TTLCache(ttl)
+
+    def _query(self, sql, params=()):
+        """プールから借りた接続でSELECTを実行して全行を返す"""
+        with _connection_slots:
+            connection = get_db_connection()
+            if not connection:
+                raise Error('データベースに接続できません')
+            try:
+                cursor = connection.cursor(dictionary=True)
+                try:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+                finally:
+                    cursor.close()
+            finally:
+                connection.close()
+
+    def _cached(self, key, loader, default):
+        try:
+            return self.cache.get_or_load(key, loader)
+        except Error as e:
+            print(f'データベース読み込みエラー: {e}')
+            return default
+
+    def _load_participants(self, event_ids):
+        """予定IDごとの参加者名のリスト {予定ID: [参加者名, ...]}"""
+        participants = {event_id: [] for event_id in event_ids}
+        if not event_ids:
+            return participants
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        rows = self._query(f"""
+            SELECT sp.schedule_event_id, u.name
+            FROM schedule_participants sp
+            JOIN users u ON sp.user_id = u.id
+            WHERE sp.schedule_event_id IN ({placeholders})
+            ORDER BY u.name
+        """, tuple(event_ids))
+        for row in rows:
+            participants[row['schedule_event_id']].append(row['name'])
+        return participants
+
+    def search(self, facility=None, date=None, keyword=None, participant=None, page=1, per_page=SEARCH_PAGE_SIZE):
+        """条件に一致する予定を検索（日付・開始時刻の順）
+
+        Returns:
+            tuple: (一致した件数, そのページの予定のリスト)
+        """
+        per_page = max(1, min(per_page, SEARCH_MAX_PAGE_SIZE))
+        page = max(1, page)
+        key = ('search', facility, date, keyword, participant, page, per_page)
+        return self._cached(key, lambda: self._search(facility, date, keyword, participant, page, per_page), (0, []))
+
+    def _search(self, facility, date, keyword, participant, page, per_page):
+        conditions = []
+        params = []
+        if facility:
+            conditions.append('f.name = %s')
+            params.append(facility)
+        if date:
+            conditions.append('se.date = %s')
+            params.append(date)
+        if keyword:
+            conditions.append('(se.title LIKE %s OR se.badge LIKE %s)')
+            params.extend([like_pattern(keyword)] * 2)
+        if participant:
+            conditions.append("""EXISTS (
+                SELECT 1 FROM schedule_participants sp
+                JOIN users u ON sp.user_id = u.id
+                WHERE sp.schedule_event_id = se.id AND u.name LIKE %s
+            )""")
+            params.append(like_pattern(participant))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        count_rows = self._query(f"""
+            SELECT COUNT(*) AS total
+            FROM schedule_events se
+            JOIN facilities f ON se.facility_id = f.id
+            {where}
+        """, tuple(params))
+        total = count_rows[0]['total']
+        if total == 0:
+            return 0, []
+
+        rows = self._query(f"""
+            SELECT se.id, f.name AS facility, se.date, se.title, se.start_datetime, se.end_datetime, se.badge, se.description_url
+            FROM schedule_events se
+            JOIN facilities f ON se.facility_id = f.id
+            {where}
+            ORDER BY se.date, se.start_datetime, se.id
+            LIMIT %s OFFSET %s
+        """, tuple(params) + (per_page, (page - 1) * per_page))
+
+        participants = self._load_participants([row['id'] for row in rows])
+        results = [{
+            'facility': row['facility'],
+            'date': row['date'].strftime('%Y-%m-%d'),
+            'title': row['title'],
+            'start_time': row['start_datetime'],
+            'end_time': row['end_datetime'],
+            'badge': row['badge'] or '',
+            'participants': participants[row['id']],
+            'url': row['description_url'] or '',
+            'id': row['id']
+        } for row in rows]
+        return total, results
+
+    def facilities(self):
+        """予定がある施設名のリスト"""
+        return self._cached(('facilities',), lambda: [row['name'] for row in self._query("""
+            SELECT f.name
+            FROM facilities f
+            WHERE EXISTS (SELECT 1 FROM schedule_events se WHERE se.facility_id = f.id)
+            ORDER BY f.name
+        """)], [])
+
+    def dates(self):
+        """予定がある日付のリスト（ソート済み）"""
+        return self._cached(('dates',), lambda: [row['date'].strftime('%Y-%m-%d') for row in self._query("""
+            SELECT DISTINCT date FROM schedule_events ORDER BY date
+        """)], [])
+
+    def events(self, facility, date):
+        """施設・日付の予定のリスト（開始時刻の順）"""
+        return self._cached(('events', facility, date), lambda: self._events(facility, date), [])
+
+    def _events(self, facility, date):
+        rows = self._query("""
+            SELECT se.id, se.title, se.start_datetime, se.end_datetime, se.badge
+            FROM schedule_events se
+            JOIN facilities f ON se.facility_id = f.id
+            WHERE f.name = %s AND se.date = %s
+            ORDER BY se.start_datetime, se.id
+        """, (facility, date))
+        participants = self._load_participants([row['id'] for row in rows])
+        return [{
+            'title': row['title'],
+            'start_time': row['start_datetime'],
+            'end_time': row['end_datetime'],
+            'badge': row['badge'] or '',
+            'participants': participants[row['id']]
+        } for row in rows]
+
+    def stats(self):
+        """施設数・日付数・予定数と、施設・日付・バッジ・ユーザーごとの予定数
+
+        集計テーブル（schedule_stats）がまだ作られていない場合は予定テーブルから合計だけを集計する。
+        """
+        return self._cached(('stats',), self._stats, empty_stats())
+
+    def _stats(self):
+        try:
+            rows = self._query("SELECT scope, name, event_count FROM schedule_stats ORDER BY scope, name")
+        except Error:
+            rows = []  # main.pyのマイグレーションがまだ実行されていない場合
+        stats = empty_stats()
+        breakdowns = {'facility': 'by_facility', 'date': 'by_date', 'badge': 'by_badge', 'user': 'by_user'}
+        has_totals = False
+        for row in rows:
+            if row['scope'] == 'total':
+                stats[f'total_{row["name"]}'] = row['event_count']
+                has_totals = True
+            elif row['scope'] in breakdowns:
+                stats[breakdowns[row['scope']]][row['name']] = row['event_count']
+        if has_totals:
+            return stats
+
+        row = self._query("""
+            SELECT COUNT(DISTINCT facility_id) AS total_facilities,
+                   COUNT(DISTINCT date) AS total_dates,
+                   COUNT(*) AS total_events
+            FROM schedule_events
+        """)[0]
+        stats.update({key: int(value) for key, value in row.items()})
+        return stats
+
+
+def empty_stats():
+    """統計の初期値（/api/stats の stats の形式）"""
+    return {
+        'total_facilities': 0,
+        'total_dates': 0,
+        'total_events': 0,
+        'total_user_events': 0,
+        'by_facility': {},
+        'by_date': {},
+        'by_badge': {},
+        'by_user': {}
+    }
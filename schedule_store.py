@@ -0,0 +1,159 @@
+"""schedule.jsonのデータをプロセス内で共有するストア
+
+app.py の各エンドポイントで共通に使う。ファイルは1回だけ読み込み、
+更新日時・サイズが変わった場合（またはreload()を呼んだ場合）のみ読み込み直す。
+リクエストには変更できないスナップショットを渡すため、スレッド間でそのまま共有できる。
+"""
+import json
+import os
+import threading
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from types import MappingProxyType
+from schedule_index import ScheduleIndex
+
+
+# スケジュールデータのファイル
+SCHEDULE_FILE = 'schedule.json'
+
+
+def freeze_event(event):
+    """予定の辞書を変更できない形に変換（参加者リストはタプル）"""
+    frozen = dict(event)
+    participants = frozen.get('participants')
+    frozen['participants'] = tuple(participants) if isinstance(participants, list) else ()
+    return MappingProxyType(frozen)
+
+
+def freeze_schedule(data):
+    """{施設名: {日付: [予定, ...]}} を変更できない形に変換
+
+    形式が正しくない要素（辞書でない施設・リストでない日付・辞書でない予定）は除外する。
+    """
+    if not isinstance(data, dict):
+        return MappingProxyType({})
+
+    frozen = {}
+    for place_name, dates_dict in data.items():
+        if not isinstance(dates_dict, dict):
+            continue
+        frozen[place_name] = MappingProxyType({
+            date_key: tuple(freeze_event(event) for event in events if isinstance(event, dict))
+            for date_key, events in dates_dict.items()
+            if isinstance(events, list)
+        })
+    return MappingProxyType(frozen)
+
+
+def make_stats(data):
+    """施設数・日付数・予定数と、施設・日付・バッジごとの予定数（/api/stats の stats の形式）"""
+    by_facility = {}
+    by_date = {}
+    by_badge = {}
+    for place_name, dates_dict in data.items():
+        by_facility[place_name] = sum(len(events) for events in dates_dict.values())
+        for date_key, events in dates_dict.items():
+            by_date[date_key] = by_date.get(date_key, 0) + len(events)
+            for event in events:
+                badge = event.get('badge') or ''
+                by_badge[badge] = by_badge.get(badge, 0) + 1
+    return {
+        'total_facilities': len(data),
+        'total_dates': len(by_date),
+        'total_events': sum(by_facility.values()),
+        'total_user_events': 0,
+        'by_facility': by_facility,
+        'by_date': dict(sorted(by_date.items())),
+        'by_badge': by_badge,
+        'by_user': {}
+    }
+
+
+def freeze_stats(stats):
+    """統計を変更できない形に変換（内訳の辞書も変更不可にする）"""
+    return MappingProxyType({
+        key: MappingProxyType(dict(value)) if isinstance(value, dict) else value
+        for key, value in stats.items()
+    })
+
+
+def copy_stats(stats):
+    """統計を通常の辞書にコピー（JSONで返す場合や、呼び出し側で変更する場合）"""
+    return {
+        key: dict(value) if isinstance(value, Mapping) else value
+        for key, value in stats.items()
+    }
+
+
+class ScheduleSnapshot:
+    """ある時点のスケジュールデータ（変更不可）
+
+    Attributes:
+        data: {施設名: {日付: (予定, ...)}}
+        version: データの版（ファイルの更新日時とサイズ）。ファイルがない場合は'empty'
+        modified_at: ファイルの更新日時（UTC）。ファイルがない場合はNone
+        facilities: 施設名のタプル（ソート済み）
+        dates: 日付のタプル（ソート済み）
+        index: 検索用のインデックス（ScheduleIndex）
+        stats: 統計（make_stats。変更不可。JSONで返す場合はcopy_statsでコピーする）
+    """
+
+    def __init__(self, data, signature=None):
+        self.data = freeze_schedule(data)
+        self.signature = signature
+        self.version = f'{signature[0]}-{signature[1]}' if signature else 'empty'
+        self.modified_at = datetime.fromtimestamp(signature[0] / 1e9, timezone.utc) if signature else None
+        self.facilities = tuple(sorted(self.data))
+        self.dates = tuple(sorted({date_key for dates_dict in self.data.values() for date_key in dates_dict}))
+        self.index = ScheduleIndex(self.data)
+        self.stats = freeze_stats(make_stats(self.data))
+
+
+class ScheduleStore:
+    """schedule.jsonを読み込んでスナップショットを共有するストア"""
+
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        """ファイルの (更新日時, サイズ)。ファイルがない場合はNone"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, signature):
+        if signature is None:
+            return ScheduleSnapshot({})
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return ScheduleSnapshot({})
+        except json.JSONDecodeError as e:
+            # 書き込み途中のファイルを読んだ場合は前回のデータを使い、次のリクエストで読み直す
+            print(f'schedule.jsonの読み込みエラー: {e}')
+            return self._snapshot or ScheduleSnapshot({})
+        return ScheduleSnapshot(data, signature)
+
+    def snapshot(self):
+        """最新のスナップショットを取得（ファイルが変わっていなければ読み込まない）"""
+        signature = self._stat()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._lock:
+            # 他のスレッドが読み込み済みの場合はそれを使う
+            if self._snapshot is None or self._snapshot.signature != signature:
+                self._snapshot = self._load(signature)
+            return self._snapshot
+
+    def reload(self):
+        """ファイルの変更にかかわらず読み込み直す"""
+        with self._lock:
+            self._snapshot = self._load(self._stat())
+            return self._snapshot
@@ -7,29 +7,8 @@ from urllib.parse import quote
 from datetime import datetime, timedelta
 import re
 import logging
-import mysql.connector
-from mysql.connector import Error
-
-
-# データベース設定
-DB_CONFIG = {
-    'host': 'akioka.cloud',
-    'database': 'akioka_db',
-    'user': 'akioka_administrator',
-    'password': 'Akiokapass0',
-    'charset': 'utf8mb4',
-    'collation': 'utf8mb4_unicode_ci'
-}
-
-
-def get_db_connection():
-    """MySQLデータベースへの接続を取得"""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
-        print(f'データベース接続エラー: {e}')
-        return None
+from db import get_db_connection
+from cybozu_session import login
 
 
 def setup_logging():
@@ -111,34 +90,6 @@ def extract_eid_from_url(url):
         return None
 
 
-def login(driver):
-    """Cybozuにログイン"""
-    # 指定したURLにアクセス
-    url = 'https://9w4c9.cybozu.com/'
-    driver.get(url)
-
-    # username-:0-textというIDが付与されたinputにto-murakamiと入力
-    input_element = driver.find_element(By.ID, 'username-:0-text')
-    input_element.send_keys('to-murakami')
-
-    # password-:1-textというIDが付与されたinput要素にto-murakami@akioka55と入力
-    password_element = driver.find_element(By.ID, 'password-:1-text')
-    password_element.send_keys('to-murakami@akioka55')
-
-    # login-buttonというクラスが付与された要素をクリック
-    login_button = driver.find_element(By.CLASS_NAME, 'login-button')
-    login_button.click()
-
-    time.sleep(1)
-    
-    # c-index-Services-ServiceItemが付与されたクラスの配下にあるa要素をクリック
-    service_item = driver.find_element(By.CLASS_NAME, 'c-index-Services-ServiceItem')
-    link = service_item.find_element(By.TAG_NAME, 'a')
-    link.click()
-    
-    time.sleep(1)
-
-
 def get_user_schedule(driver, user_name, user_id, target_date, connection, logger):
     """ユーザー個人のスケジュールを取得"""
     try:
@@ -0,0 +1,135 @@
+"""保存したCybozuのページ（tests/fixtures）をローカルのHTTPサーバーで返し、
+HTTPバックエンドの取得・解析結果を確認するテスト
+
+python -m unittest discover tests または python -m pytest tests で実行する。
+"""
+import os
+import threading
+import unittest
+from datetime import date
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from cybozu_http import CybozuHttpSession
+from cybozu_session import is_logged_in
+from main import fetch_week_events, fetch_participant_names
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """/o/ag.cgi?page=... にpageと同じ名前の保存済みHTMLを返すハンドラ"""
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        parsed = urlparse(self.path)
+        page = parse_qs(parsed.query).get('page', [''])[0]
+        if parsed.path == '/o/':
+            body = b'<html><body>service</body></html>'
+        elif parsed.path == '/o/ag.cgi' and page in ('ScheduleIndex', 'ScheduleView'):
+            body = read_fixture(f'{page}.html')
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # テストの出力にアクセスログを出さない
+
+
+class FetchWeekEventsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), FixtureHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.session = CybozuHttpSession(self.base_url)
+
+    def view_url(self, target_date, eid):
+        return (
+            f'{self.base_url}/o/ag.cgi?page=ScheduleView&UID=f12&GID=&Date={target_date}'
+            f'&BDate=da.2025.11.3&sEID={eid}&CP=sg'
+        )
+
+    def test_events_by_date(self):
+        events_by_date = fetch_week_events(self.session, '第1会議室', date(2025, 11, 3))
+
+        # 時刻表示がない予定（終日:設備点検）は施設予定として登録しない
+        self.assertEqual(events_by_date, {
+            '2025-11-03': [
+                {
+                    'title': '定例ミーティング',
+                    'start_datetime': '10:00',
+                    'end_datetime': '11:30',
+                    'badge': '会議',
+                    'description_url': self.view_url('da.2025.11.3', 139027),
+                    'eid': 139027
+                },
+                {
+                    'title': '設計レビュー',
+                    'start_datetime': '13:00',
+                    'end_datetime': '14:00',
+                    'badge': '',
+                    'description_url': self.view_url('da.2025.11.3', 139031),
+                    'eid': 139031
+                }
+            ],
+            '2025-11-05': [
+                {
+                    'title': 'A社 打合せ',
+                    'start_datetime': '9:00',
+                    'end_datetime': '10:00',
+                    'badge': '来客',
+                    'description_url': self.view_url('da.2025.11.5', 139052),
+                    'eid': 139052
+                }
+            ]
+        })
+
+        # 週表示のURLはセッションの接続先に対して組み立てる
+        self.assertEqual(len(self.server.requests), 1)
+        query = parse_qs(urlparse(self.server.requests[0]).query)
+        self.assertEqual(query['page'], ['ScheduleIndex'])
+        self.assertEqual(query['date'], ['da.2025.11.3'])
+        self.assertEqual(query['Text'], ['第1会議室'])
+
+    def test_events_by_date_require_time(self):
+        events_by_date = fetch_week_events(self.session, '山田 太郎', date(2025, 11, 3), require_time=True)
+
+        self.assertEqual(sorted(events_by_date), ['2025-11-03', '2025-11-05'])
+        self.assertEqual([event['eid'] for event in events_by_date['2025-11-03']], [139027, 139031])
+
+    def test_participant_names(self):
+        names = fetch_participant_names(self.session, self.view_url('da.2025.11.3', 139027))
+
+        self.assertEqual(names, ['山田 太郎', '佐藤 花子', '鈴木 一郎'])
+
+    def test_is_logged_in_uses_session_base_url(self):
+        self.assertTrue(is_logged_in(self.session))
+        self.assertEqual(self.server.requests, ['/o/'])
+
+
+if __name__ == '__main__':
+    unittest.main()
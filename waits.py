@@ -0,0 +1,110 @@
+"""Seleniumの待機処理
+
+固定のtime.sleepの代わりに、具体的な条件（要素の出現・画面遷移など）を満たすまで待機する。
+条件ごとにタイムアウトを設定でき、待機時間を計測して集計する。
+"""
+import threading
+import time
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+
+# 条件ごとのタイムアウト（秒）
+WAIT_TIMEOUTS = {
+    'default': 10,
+    'login_form': 15,          # ログイン画面の入力欄
+    'login_complete': 15,      # ログイン後のサービス一覧
+    'service_open': 15,        # サイボウズOfficeへの遷移
+    'schedule_table': 15,      # 週表示のtblgroupweek
+    'schedule_view': 10,       # 予定詳細（参加者一覧）の読み込み
+    'entry_form': 15,          # 予定登録フォーム
+    'search_results': 5,       # 参加者検索の結果
+    'submit': 20               # 登録後の画面遷移
+}
+
+# 条件を確認する間隔（秒）
+POLL_INTERVAL = 0.1
+
+# 条件ごとの待機時間の計測結果 {条件名: {'count', 'total', 'max', 'timeouts'}}
+wait_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def record_wait(name, elapsed, timed_out=False):
+    """待機時間を記録"""
+    with _metrics_lock:
+        metric = wait_metrics.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+        metric['count'] += 1
+        metric['total'] += elapsed
+        metric['max'] = max(metric['max'], elapsed)
+        if timed_out:
+            metric['timeouts'] += 1
+
+
+def wait_for(driver, name, condition, timeout=None):
+    """条件を満たすまで待機して、条件の戻り値を返す
+
+    Args:
+        name: 条件名（WAIT_TIMEOUTSのキー、計測結果の集計単位）
+        condition: driverを受け取る関数（expected_conditionsなど）
+        timeout: タイムアウト（秒）。省略時はWAIT_TIMEOUTSの値
+
+    Raises:
+        TimeoutException: タイムアウトまでに条件を満たさなかった場合
+    """
+    if timeout is None:
+        timeout = WAIT_TIMEOUTS.get(name, WAIT_TIMEOUTS['default'])
+
+    start = time.perf_counter()
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition)
+    except TimeoutException:
+        record_wait(name, time.perf_counter() - start, timed_out=True)
+        raise
+    record_wait(name, time.perf_counter() - start)
+    return result
+
+
+def wait_for_element(driver, name, by, value, timeout=None):
+    """要素が出現するまで待機して、その要素を返す"""
+    return wait_for(driver, name, EC.presence_of_element_located((by, value)), timeout)
+
+
+def wait_for_clickable(driver, name, by, value, timeout=None):
+    """要素がクリック可能になるまで待機して、その要素を返す"""
+    return wait_for(driver, name, EC.element_to_be_clickable((by, value)), timeout)
+
+
+def wait_for_url_change(driver, name, old_url, timeout=None):
+    """画面遷移（URLの変化）を待機"""
+    return wait_for(driver, name, EC.url_changes(old_url), timeout)
+
+
+def wait_for_page_load(driver, name, timeout=None):
+    """ページの読み込み完了（document.readyState == 'complete'）を待機"""
+    return wait_for(
+        driver,
+        name,
+        lambda d: d.execute_script('return document.readyState') == 'complete',
+        timeout
+    )
+
+
+def reset_wait_metrics():
+    """待機時間の計測結果をクリア（デーモンモードで同期ごとに集計し直す場合）"""
+    with _metrics_lock:
+        wait_metrics.clear()
+
+
+def format_wait_metrics():
+    """待機時間の集計結果をログ用の文字列リストで返す"""
+    lines = []
+    with _metrics_lock:
+        for name, metric in sorted(wait_metrics.items()):
+            average = metric['total'] / metric['count'] if metric['count'] else 0.0
+            line = f'{name}: {metric["count"]}回 / 合計{metric["total"]:.2f}秒 / 平均{average:.2f}秒 / 最大{metric["max"]:.2f}秒'
+            if metric['timeouts']:
+                line += f' / タイムアウト{metric["timeouts"]}回'
+            lines.append(line)
+    return lines